@@ -1,8 +1,76 @@
 from django.contrib import admin
+from django.db.models import Q
 
 # Register your models here.
 from accounts.models import User, Profile, PasswordReset
+from common.admin import LargeTableAdmin
 
-admin.site.register(User)
-admin.site.register(Profile)
-admin.site.register(PasswordReset)
\ No newline at end of file
+from .filters import PrefixFilter
+from .search import search_users
+
+
+def prefix_search(queryset, field_name, value):
+    return PrefixFilter(field_name=field_name).filter(queryset, value)
+
+
+class UserLookupAdmin(LargeTableAdmin):
+    """Admin for models with a `user` foreign key, searchable by email prefix."""
+    list_select_related = ('user',)
+    raw_id_fields = ('user',)
+    search_fields = ('^user__email',)
+    search_help_text = 'Email prefix'
+    ordering = ('-pk',)
+
+    def get_search_results(self, request, queryset, search_term):
+        search_term = search_term.strip()
+        if not search_term:
+            return queryset, False
+        # Resolve the users first so the LOWER(email) index is used
+        return queryset.filter(user__in=prefix_search(User.objects.all(), 'email', search_term).values('pk')), False
+
+
+@admin.register(User)
+class UserAdmin(LargeTableAdmin):
+    list_display = ('email', 'first_name', 'last_name', 'role', 'is_email_verified', 'is_active', 'is_staff')
+    # Both covered by the (role, is_email_verified) index
+    list_filter = ('role', 'is_email_verified')
+    search_fields = ('^email', 'first_name', 'last_name', 'profile__city')
+    search_help_text = 'Email prefix, or words from the name or city'
+    # Unique and indexed, so pages are read in index order
+    ordering = ('email',)
+    readonly_fields = ('email_verification_token', 'last_login', 'date_joined')
+
+    def get_search_results(self, request, queryset, search_term):
+        search_term = search_term.strip()
+        if not search_term:
+            return queryset, False
+        if '@' in search_term:
+            return prefix_search(queryset, 'email', search_term), False
+        # Each side is resolved from its own index, then matched by primary key
+        users = User.objects.all()
+        return queryset.filter(
+            Q(pk__in=prefix_search(users, 'email', search_term).values('pk'))
+            | Q(pk__in=search_users(users, search_term).values('pk'))
+        ), False
+
+
+@admin.register(Profile)
+class ProfileAdmin(UserLookupAdmin):
+    list_display = ('user', 'city', 'country', 'zip_code')
+    search_help_text = 'Email prefix, or city prefix'
+
+    def get_search_results(self, request, queryset, search_term):
+        search_term = search_term.strip()
+        if not search_term or '@' in search_term:
+            return super().get_search_results(request, queryset, search_term)
+        return queryset.filter(
+            Q(pk__in=prefix_search(Profile.objects.all(), 'city', search_term).values('pk'))
+            | Q(user__in=prefix_search(User.objects.all(), 'email', search_term).values('pk'))
+        ), False
+
+
+@admin.register(PasswordReset)
+class PasswordResetAdmin(UserLookupAdmin):
+    list_display = ('user', 'created_at', 'expires_at', 'is_used')
+    list_filter = ('is_used',)
+    readonly_fields = ('token',)
@@ -4,3 +4,16 @@ from django.apps import AppConfig
 class AccountsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'accounts'
+
+    def ready(self):
+        from django.contrib.auth.password_validation import get_default_password_validators
+        from django.db.models.signals import post_migrate, pre_migrate
+
+        from . import signals
+        from .jwks import install_token_backend
+
+        pre_migrate.connect(signals.suspend_search_triggers, sender=self)
+        post_migrate.connect(signals.restore_search_triggers, sender=self)
+        install_token_backend()
+        # Build the validators (and load the common password list) up front
+        get_default_password_validators()
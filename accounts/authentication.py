@@ -0,0 +1,96 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+
+from .revocation import revocation_list
+
+
+class TokenCache:
+    """
+    Bounded, thread-safe LRU of validated tokens.
+
+    Entries are keyed by a SHA-256 digest of the raw token, so the token
+    itself is never kept as a key, and expire at the token's `exp` claim.
+    """
+
+    def __init__(self, maxsize=1024):
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def make_key(raw_token):
+        if isinstance(raw_token, str):
+            raw_token = raw_token.encode()
+        return hashlib.sha256(raw_token).digest()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            token, expires_at, _ = entry
+            if expires_at <= time.time():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return token
+
+    def set(self, key, token):
+        expires_at = token.payload.get('exp')
+        if expires_at is None or self.maxsize <= 0:
+            return
+        user_id = token.payload.get(api_settings.USER_ID_CLAIM)
+        with self._lock:
+            self._entries[key] = (token, expires_at, user_id)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def evict_user(self, user_id):
+        """Drop every cached token issued to the given user."""
+        user_id = str(user_id)
+        with self._lock:
+            stale = [key for key, entry in self._entries.items() if str(entry[2]) == user_id]
+            for key in stale:
+                del self._entries[key]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+token_cache = TokenCache(getattr(settings, 'JWT_VERIFICATION_CACHE_SIZE', 1024))
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """
+    JWT authentication that skips signature verification for tokens
+    already validated by this process.
+
+    The user lookup and the revocation list are still consulted on every
+    request, so deactivated users and revoked tokens are rejected even when
+    the signature check is skipped.
+    """
+
+    cache = token_cache
+
+    def get_validated_token(self, raw_token):
+        key = self.cache.make_key(raw_token)
+        validated_token = self.cache.get(key)
+        if validated_token is None:
+            validated_token = super().get_validated_token(raw_token)
+            self.cache.set(key, validated_token)
+        if revocation_list.is_revoked(validated_token):
+            raise InvalidToken(_('Token has been revoked'))
+        return validated_token
@@ -0,0 +1,59 @@
+import django_filters
+from django.contrib.auth import get_user_model
+from django.db.models.functions import Lower
+
+from .search import search_users
+
+User = get_user_model()
+
+
+class PrefixFilter(django_filters.CharFilter):
+    """
+    Case-insensitive prefix filter written as a range over LOWER(field), so
+    it can use the functional LOWER() indexes on any database.
+    """
+
+    def filter(self, qs, value):
+        if not value:
+            return qs
+        prefix = value.lower()
+        upper_bound = prefix[:-1] + chr(ord(prefix[-1]) + 1)
+
+        relation, _, field_name = self.field_name.rpartition('__')
+        if relation:
+            # Filter the related table through a subquery so the planner can
+            # start from its index instead of scanning the outer join
+            remote = qs.model._meta.get_field(relation)
+            related_qs = self.prefix_range(remote.related_model.objects, field_name, prefix, upper_bound)
+            return qs.filter(pk__in=related_qs.values(remote.field.attname))
+        return self.prefix_range(qs, field_name, prefix, upper_bound)
+
+    @staticmethod
+    def prefix_range(qs, field_name, prefix, upper_bound):
+        alias = f'{field_name}_lower'
+        return qs.alias(**{alias: Lower(field_name)}).filter(
+            **{f'{alias}__gte': prefix, f'{alias}__lt': upper_bound}
+        )
+
+
+class UserFilter(django_filters.FilterSet):
+    """Filters for the staff user listing."""
+
+    email = PrefixFilter(field_name='email')
+    first_name = PrefixFilter(field_name='first_name')
+    last_name = PrefixFilter(field_name='last_name')
+    city = PrefixFilter(field_name='profile__city')
+    is_email_verified = django_filters.BooleanFilter(method='filter_verified')
+    q = django_filters.CharFilter(method='filter_search')
+
+    class Meta:
+        model = User
+        fields = ['role', 'is_email_verified']
+
+    def filter_verified(self, queryset, name, value):
+        # `= True` compiles to a bare column test, which can't use the second
+        # column of the (role, is_email_verified) index; IN keeps it an equality
+        return queryset.filter(is_email_verified__in=[value])
+
+    def filter_search(self, queryset, name, value):
+        return search_users(queryset, value)
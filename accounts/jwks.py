@@ -0,0 +1,133 @@
+from pathlib import Path
+
+import jwt
+from cryptography.hazmat.primitives.asymmetric import ed448, ed25519, rsa
+from cryptography.hazmat.primitives.serialization import load_pem_private_key, load_pem_public_key
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.utils.translation import gettext_lazy as _
+from jwt.algorithms import OKPAlgorithm, RSAAlgorithm
+from rest_framework_simplejwt.backends import TokenBackend
+from rest_framework_simplejwt.exceptions import TokenBackendError, TokenBackendExpiredToken
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import Token
+
+
+class SigningKey:
+    """An RSA or Ed25519/Ed448 key identified by its `kid`."""
+
+    def __init__(self, kid, pem, algorithm=None):
+        if isinstance(pem, str):
+            pem = pem.encode()
+        self.kid = kid
+        try:
+            self.private_key = load_pem_private_key(pem, password=None)
+            self.public_key = self.private_key.public_key()
+        except (TypeError, ValueError):
+            # Retired keys only need their public half for verification
+            self.private_key = None
+            self.public_key = load_pem_public_key(pem)
+
+        if isinstance(self.public_key, rsa.RSAPublicKey):
+            self.algorithm = algorithm or 'RS256'
+            self.jwk_algorithm = RSAAlgorithm
+        elif isinstance(self.public_key, (ed25519.Ed25519PublicKey, ed448.Ed448PublicKey)):
+            self.algorithm = algorithm or 'EdDSA'
+            self.jwk_algorithm = OKPAlgorithm
+        else:
+            raise ImproperlyConfigured(f"JWT signing key '{kid}' must be an RSA or EdDSA key.")
+
+    def to_jwk(self):
+        jwk = self.jwk_algorithm.to_jwk(self.public_key, as_dict=True)
+        jwk.update({'kid': self.kid, 'alg': self.algorithm, 'use': 'sig'})
+        return jwk
+
+
+class KeyRingTokenBackend(TokenBackend):
+    """
+    Token backend that signs with the active key and puts its `kid` in the
+    header, and verifies against any key still in the ring so tokens
+    issued before a rotation stay valid until they expire.
+    """
+
+    def __init__(self, keys, **kwargs):
+        self.keys = {key.kid: key for key in keys}
+        self.active_key = next((key for key in keys if key.private_key is not None), None)
+        if self.active_key is None:
+            raise ImproperlyConfigured('JWT_SIGNING_KEYS needs at least one private key.')
+        super().__init__(self.active_key.algorithm, **kwargs)
+        self.jwks = {'keys': [key.to_jwk() for key in keys]}
+
+    def encode(self, payload):
+        jwt_payload = payload.copy()
+        if self.audience is not None:
+            jwt_payload['aud'] = self.audience
+        if self.issuer is not None:
+            jwt_payload['iss'] = self.issuer
+
+        return jwt.encode(
+            jwt_payload,
+            self.active_key.private_key,
+            algorithm=self.active_key.algorithm,
+            headers={'kid': self.active_key.kid},
+            json_encoder=self.json_encoder,
+        )
+
+    def decode(self, token, verify=True):
+        try:
+            key = self.keys.get(jwt.get_unverified_header(token).get('kid'))
+            if key is None:
+                raise TokenBackendError(_('Token is invalid'))
+            return jwt.decode(
+                token,
+                key.public_key,
+                algorithms=[key.algorithm],
+                audience=self.audience,
+                issuer=self.issuer,
+                leeway=self.get_leeway(),
+                options={
+                    'verify_aud': self.audience is not None,
+                    'verify_signature': verify,
+                },
+            )
+        except jwt.InvalidAlgorithmError as ex:
+            raise TokenBackendError(_('Invalid algorithm specified')) from ex
+        except jwt.ExpiredSignatureError as ex:
+            raise TokenBackendExpiredToken(_('Token is expired')) from ex
+        except jwt.InvalidTokenError as ex:
+            raise TokenBackendError(_('Token is invalid')) from ex
+
+
+def load_signing_keys(entries):
+    """Build `SigningKey`s from `JWT_SIGNING_KEYS` entries, active key first."""
+    keys = []
+    for entry in entries:
+        pem = entry.get('key') or Path(entry['path']).read_bytes()
+        keys.append(SigningKey(entry['kid'], pem, entry.get('algorithm')))
+    return keys
+
+
+def get_token_backend():
+    """Return a key ring backend, or None to keep simplejwt's HMAC backend."""
+    keys = load_signing_keys(getattr(settings, 'JWT_SIGNING_KEYS', []))
+    if not keys:
+        return None
+    return KeyRingTokenBackend(
+        keys,
+        audience=api_settings.AUDIENCE,
+        issuer=api_settings.ISSUER,
+        leeway=api_settings.LEEWAY,
+        json_encoder=api_settings.JSON_ENCODER,
+    )
+
+
+def install_token_backend():
+    """Point every simplejwt token class at the configured backend."""
+    Token._token_backend = get_token_backend()
+
+
+def get_jwks():
+    backend = Token._token_backend
+    if isinstance(backend, KeyRingTokenBackend):
+        return backend.jwks
+    return {'keys': []}
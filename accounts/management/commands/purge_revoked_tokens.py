@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from accounts.revocation import revocation_list
+
+
+class Command(BaseCommand):
+    help = 'Delete revoked-token rows whose tokens have expired.'
+
+    def handle(self, *args, **options):
+        deleted = revocation_list.purge_expired()
+        self.stdout.write(self.style.SUCCESS(f'Deleted {deleted} expired revoked tokens.'))
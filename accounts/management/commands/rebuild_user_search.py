@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from accounts.search import rebuild_search_index, uses_fts
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the full-text index used by the user search filter.'
+
+    def handle(self, *args, **options):
+        if not uses_fts():
+            self.stdout.write('The database does not use a full-text index for user search.')
+            return
+        rebuild_search_index()
+        self.stdout.write(self.style.SUCCESS('User search index rebuilt.'))
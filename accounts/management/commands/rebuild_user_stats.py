@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from accounts.stats import rebuild_user_stats
+
+
+class Command(BaseCommand):
+    help = 'Recount the user statistics counters from the user and profile tables.'
+
+    def handle(self, *args, **options):
+        rebuild_user_stats()
+        self.stdout.write(self.style.SUCCESS('User statistics rebuilt.'))
@@ -0,0 +1,103 @@
+# Generated by Django 5.2.1 on 2026-10-19 00:43
+
+import django.db.models.functions.text
+from django.db import migrations, models
+
+# The SQL is copied here so this migration doesn't change with accounts.search
+CREATE_SQL = [
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS accounts_user_search USING fts5(
+        first_name, last_name, city, tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3'
+    )
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS accounts_user_search_ai AFTER INSERT ON accounts_user BEGIN
+        INSERT INTO accounts_user_search (rowid, first_name, last_name)
+        VALUES (new.rowid, new.first_name, new.last_name);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS accounts_user_search_au AFTER UPDATE OF first_name, last_name ON accounts_user BEGIN
+        UPDATE accounts_user_search SET first_name = new.first_name, last_name = new.last_name
+        WHERE rowid = new.rowid;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS accounts_user_search_ad AFTER DELETE ON accounts_user BEGIN
+        DELETE FROM accounts_user_search WHERE rowid = old.rowid;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS accounts_profile_search_ai AFTER INSERT ON accounts_profile BEGIN
+        UPDATE accounts_user_search SET city = new.city
+        WHERE rowid = (SELECT rowid FROM accounts_user WHERE id = new.user_id);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS accounts_profile_search_au AFTER UPDATE OF city ON accounts_profile BEGIN
+        UPDATE accounts_user_search SET city = new.city
+        WHERE rowid = (SELECT rowid FROM accounts_user WHERE id = new.user_id);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS accounts_profile_search_ad AFTER DELETE ON accounts_profile BEGIN
+        UPDATE accounts_user_search SET city = NULL
+        WHERE rowid = (SELECT rowid FROM accounts_user WHERE id = old.user_id);
+    END
+    """,
+    """
+    INSERT INTO accounts_user_search (rowid, first_name, last_name, city)
+    SELECT u.rowid, u.first_name, u.last_name, p.city
+    FROM accounts_user u LEFT JOIN accounts_profile p ON p.user_id = u.id
+    """,
+]
+
+DROP_SQL = [
+    'DROP TRIGGER IF EXISTS accounts_profile_search_ad',
+    'DROP TRIGGER IF EXISTS accounts_profile_search_au',
+    'DROP TRIGGER IF EXISTS accounts_profile_search_ai',
+    'DROP TRIGGER IF EXISTS accounts_user_search_ad',
+    'DROP TRIGGER IF EXISTS accounts_user_search_au',
+    'DROP TRIGGER IF EXISTS accounts_user_search_ai',
+    'DROP TABLE IF EXISTS accounts_user_search',
+]
+
+
+def run_sqlite(statements):
+    def run(apps, schema_editor):
+        if schema_editor.connection.vendor == 'sqlite':
+            for sql in statements:
+                schema_editor.execute(sql)
+    return run
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0002_revokedtoken'),
+        ('auth', '0012_alter_user_first_name_max_length'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='profile',
+            index=models.Index(django.db.models.functions.text.Lower('city'), name='accounts_prof_city_lower_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='user',
+            index=models.Index(django.db.models.functions.text.Lower('email'), name='accounts_user_email_lower_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='user',
+            index=models.Index(django.db.models.functions.text.Lower('first_name'), name='accounts_user_fname_lower_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='user',
+            index=models.Index(django.db.models.functions.text.Lower('last_name'), name='accounts_user_lname_lower_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='user',
+            index=models.Index(fields=['role', 'is_email_verified'], name='accounts_user_role_verif_idx'),
+        ),
+        migrations.RunPython(run_sqlite(CREATE_SQL), run_sqlite(DROP_SQL)),
+    ]
@@ -0,0 +1,49 @@
+# Generated by Django 5.2.1 on 2026-10-19 01:21
+
+import uuid
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def count_existing_users(apps, schema_editor):
+    UserStat = apps.get_model('accounts', 'UserStat')
+    tracked = {'User': ('role', 'is_email_verified'), 'Profile': ('city', 'country')}
+    counts = {}
+    for model_name, fields in tracked.items():
+        model = apps.get_model('accounts', model_name)
+        for field in fields:
+            for value, total in model.objects.values_list(field).annotate(total=Count('pk')).order_by():
+                if value is None:
+                    value = ''
+                elif isinstance(value, bool):
+                    value = 'true' if value else 'false'
+                key = (field, str(value))
+                counts[key] = counts.get(key, 0) + total
+    UserStat.objects.bulk_create(
+        UserStat(dimension=dimension, value=value, count=count) for (dimension, value), count in counts.items()
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0004_profile_coordinates'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserStat',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('dimension', models.CharField(max_length=32)),
+                ('value', models.CharField(blank=True, max_length=100)),
+                ('count', models.IntegerField(default=0)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('dimension', 'value'), name='accounts_userstat_dimension_value')],
+            },
+        ),
+        migrations.RunPython(count_existing_users, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,46 @@
+# Generated by Django 5.2.1 on 2026-10-19 01:32
+
+import common.uuids
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0005_userstat'),
+    ]
+
+    # Only the Python-side default changes, so nothing is run against the
+    # database (SQLite would otherwise rebuild the tables). Existing UUIDv4
+    # keys stay valid; new rows get the version UUID_PRIMARY_KEY_VERSION picks.
+    operations = [
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.AlterField(
+                    model_name='passwordreset',
+                    name='id',
+                    field=models.UUIDField(default=common.uuids.generate_uuid, editable=False, primary_key=True, serialize=False),
+                ),
+                migrations.AlterField(
+                    model_name='profile',
+                    name='id',
+                    field=models.UUIDField(default=common.uuids.generate_uuid, editable=False, primary_key=True, serialize=False),
+                ),
+                migrations.AlterField(
+                    model_name='revokedtoken',
+                    name='id',
+                    field=models.UUIDField(default=common.uuids.generate_uuid, editable=False, primary_key=True, serialize=False),
+                ),
+                migrations.AlterField(
+                    model_name='user',
+                    name='id',
+                    field=models.UUIDField(default=common.uuids.generate_uuid, editable=False, primary_key=True, serialize=False),
+                ),
+                migrations.AlterField(
+                    model_name='userstat',
+                    name='id',
+                    field=models.UUIDField(default=common.uuids.generate_uuid, editable=False, primary_key=True, serialize=False),
+                ),
+            ],
+        ),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 5.2.1 on 2026-10-19 09:12
+
+import django.core.validators
+from django.db import migrations, models
+from django.db.models import Q
+
+
+def clear_invalid_coordinates(apps, schema_editor):
+    # Coordinates stored before the ranges were enforced, including
+    # infinities, can't be searched around; drop them so they get geocoded
+    # or re-entered
+    Profile = apps.get_model('accounts', 'Profile')
+    Profile.objects.using(schema_editor.connection.alias).filter(
+        Q(latitude__lt=-90) | Q(latitude__gt=90) | Q(longitude__lt=-180) | Q(longitude__gt=180)
+        | Q(latitude__isnull=True, longitude__isnull=False)
+        | Q(latitude__isnull=False, longitude__isnull=True)
+    ).update(latitude=None, longitude=None, geohash=None)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0006_generate_uuid_primary_keys'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='profile',
+            name='latitude',
+            field=models.FloatField(blank=True, null=True, validators=[django.core.validators.MinValueValidator(-90), django.core.validators.MaxValueValidator(90)]),
+        ),
+        migrations.AlterField(
+            model_name='profile',
+            name='longitude',
+            field=models.FloatField(blank=True, null=True, validators=[django.core.validators.MinValueValidator(-180), django.core.validators.MaxValueValidator(180)]),
+        ),
+        migrations.RunPython(clear_invalid_coordinates, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.2.1 on 2026-10-19 09:40
+
+from django.db import migrations
+
+LOWER_INDEXES = [
+    'accounts_user_email_lower_idx',
+    'accounts_user_fname_lower_idx',
+    'accounts_user_lname_lower_idx',
+    'accounts_prof_city_lower_idx',
+]
+
+
+def reindex(apps, schema_editor):
+    # The LOWER() indexes were built with SQLite's ASCII-only LOWER(); rebuild
+    # them with the Unicode one accounts.signals registers on each connection
+    if schema_editor.connection.vendor == 'sqlite':
+        for name in LOWER_INDEXES:
+            schema_editor.execute(f'REINDEX {name}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0007_profile_coordinate_ranges'),
+    ]
+
+    operations = [
+        migrations.RunPython(reindex, migrations.RunPython.noop),
+    ]
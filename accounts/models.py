@@ -1,9 +1,100 @@
-from django.db import models
+from django.core.validators import MaxValueValidator, MinValueValidator
+from django.db import IntegrityError, models, router, transaction
+from django.db.models import F
+from django.db.models.functions import Lower
 from django.contrib.auth.models import AbstractUser, BaseUserManager
+from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
+from common.geo import geohash_encode, get_geocoder
 from common.models import TimeStampedModel
 from cloudinary.models import CloudinaryField
 
+class UserStat(TimeStampedModel):
+    """Running count of users per value of a tracked attribute."""
+    dimension = models.CharField(max_length=32)
+    value = models.CharField(max_length=100, blank=True)
+    count = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['dimension', 'value'], name='accounts_userstat_dimension_value'),
+        ]
+
+    def __str__(self):
+        return f"{self.dimension}={self.value}: {self.count}"
+
+    @staticmethod
+    def to_value(value):
+        if value is None:
+            return ''
+        if isinstance(value, bool):
+            return 'true' if value else 'false'
+        return str(value)
+
+    @classmethod
+    def increment(cls, dimension, value, delta, using=None):
+        counters = cls.objects.using(using).filter(dimension=dimension, value=value)
+        if counters.update(count=F('count') + delta, updated_at=timezone.now()):
+            return
+        try:
+            with transaction.atomic(using=using):
+                cls.objects.using(using).create(dimension=dimension, value=value, count=delta)
+        except IntegrityError:
+            # Another transaction created the row first
+            counters.update(count=F('count') + delta, updated_at=timezone.now())
+
+    @classmethod
+    def record_change(cls, old, new, using=None):
+        """Move counts from the `old` to the `new` {dimension: value} mapping."""
+        deltas = {}
+        for values, delta in ((old, -1), (new, 1)):
+            for dimension, value in (values or {}).items():
+                deltas[dimension, value] = deltas.get((dimension, value), 0) + delta
+        for (dimension, value), delta in deltas.items():
+            if delta:
+                cls.increment(dimension, value, delta, using=using)
+
+
+class UserStatsMixin:
+    """
+    Keeps `UserStat` counters for the fields in `stat_fields` up to date,
+    in the same transaction as each save. Bulk `QuerySet.update()` calls
+    bypass this; `manage.py rebuild_user_stats` recounts from scratch.
+    """
+    stat_fields = ()
+
+    def get_stat_values(self):
+        return {field: UserStat.to_value(getattr(self, field)) for field in self.stat_fields}
+
+    def get_saved_stat_values(self, using):
+        """Read the stored values, locking the row until the transaction ends."""
+        row = (
+            type(self)._base_manager.using(using).select_for_update()
+            .filter(pk=self.pk).values(*self.stat_fields).first()
+        )
+        return {field: UserStat.to_value(value) for field, value in row.items()} if row else None
+
+    def save(self, *args, **kwargs):
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and not set(self.stat_fields) & set(update_fields):
+            # No counted field is written, so skip the locked read
+            return super().save(*args, **kwargs)
+        using = kwargs.get('using') or router.db_for_write(type(self), instance=self)
+        with transaction.atomic(using=using):
+            # The instance may be stale, so diff against the stored row
+            old = None if self._state.adding else self.get_saved_stat_values(using)
+            super().save(*args, **kwargs)
+
+            unchanged = self.get_deferred_fields()
+            if update_fields is not None:
+                unchanged |= set(self.stat_fields) - set(update_fields)
+            new = {
+                field: old[field] if old and field in unchanged else UserStat.to_value(getattr(self, field))
+                for field in self.stat_fields
+            }
+            UserStat.record_change(old, new, using=using)
+
+
 class UserManager(BaseUserManager):
     """Define a model manager for User model with no username field."""
     use_in_migrations = True
@@ -36,7 +127,7 @@ class UserManager(BaseUserManager):
 
         return self._create_user(email, password, **extra_fields)
 
-class User(AbstractUser, TimeStampedModel):
+class User(UserStatsMixin, AbstractUser, TimeStampedModel):
     """Custom User model with email as the unique identifier."""
     ROLE_CHOICES = (
         ('restaurant', 'Restaurant'),
@@ -56,11 +147,20 @@ class User(AbstractUser, TimeStampedModel):
     REQUIRED_FIELDS = []
     
     objects = UserManager()
+    stat_fields = ('role', 'is_email_verified')
+
+    class Meta(AbstractUser.Meta):
+        indexes = [
+            models.Index(Lower('email'), name='accounts_user_email_lower_idx'),
+            models.Index(Lower('first_name'), name='accounts_user_fname_lower_idx'),
+            models.Index(Lower('last_name'), name='accounts_user_lname_lower_idx'),
+            models.Index(fields=['role', 'is_email_verified'], name='accounts_user_role_verif_idx'),
+        ]
     
     def __str__(self):
         return self.email
 
-class Profile(TimeStampedModel):
+class Profile(UserStatsMixin, TimeStampedModel):
     """User profile information."""
     user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='profile')
     profile_picture = CloudinaryField('profile_pictures', blank=True, null=True)
@@ -69,10 +169,44 @@ class Profile(TimeStampedModel):
     state = models.CharField(max_length=100, blank=True, null=True)
     country = models.CharField(max_length=100, blank=True, null=True)
     zip_code = models.CharField(max_length=20, blank=True, null=True)
+    latitude = models.FloatField(
+        blank=True, null=True, validators=[MinValueValidator(-90), MaxValueValidator(90)]
+    )
+    longitude = models.FloatField(
+        blank=True, null=True, validators=[MinValueValidator(-180), MaxValueValidator(180)]
+    )
+    geohash = models.CharField(max_length=12, blank=True, null=True, editable=False)
+
+    stat_fields = ('city', 'country')
+
+    class Meta:
+        indexes = [
+            models.Index(Lower('city'), name='accounts_prof_city_lower_idx'),
+            models.Index(fields=['geohash'], name='accounts_prof_geohash_idx'),
+        ]
     
     def __str__(self):
         return f"Profile for {self.user.email}"
 
+    def save(self, *args, **kwargs):
+        if self.latitude is not None and self.longitude is not None:
+            self.geohash = geohash_encode(self.latitude, self.longitude)
+        else:
+            self.geohash = None
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and {'latitude', 'longitude'} & set(update_fields):
+            kwargs['update_fields'] = {*update_fields, 'geohash'}
+        super().save(*args, **kwargs)
+
+    def geocode(self, geocoder=None):
+        """Fill in coordinates from the address fields, if they can be resolved."""
+        geocoder = geocoder or get_geocoder()
+        coordinates = geocoder.geocode(
+            address=self.address, city=self.city, state=self.state,
+            country=self.country, zip_code=self.zip_code,
+        )
+        self.latitude, self.longitude = coordinates or (None, None)
+
 class PasswordReset(TimeStampedModel):
     """Password reset tokens."""
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='password_resets')
@@ -82,3 +216,18 @@ class PasswordReset(TimeStampedModel):
     
     def __str__(self):
         return f"Password reset for {self.user.email}"
+
+class RevokedToken(TimeStampedModel):
+    """
+    A revoked refresh token, keyed by its `jti`, or a `user:<id>` entry that
+    revokes every token the user was issued before `updated_at`.
+    """
+    key = models.CharField(max_length=255, unique=True)
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='revoked_tokens')
+    expires_at = models.DateTimeField(db_index=True)
+
+    class Meta:
+        indexes = [models.Index(fields=['updated_at'])]
+
+    def __str__(self):
+        return f"Revoked token {self.key}"
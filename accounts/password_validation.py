@@ -0,0 +1,78 @@
+"""
+Drop-in replacements for Django's similarity and common-password
+validators that give the same results with less work per call.
+"""
+import functools
+import gzip
+import re
+from collections import Counter
+
+from django.contrib.auth import password_validation
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+
+
+@functools.cache
+def load_password_list(path):
+    """Read a (possibly gzipped) password list once per process."""
+    try:
+        with gzip.open(path, 'rt', encoding='utf-8') as f:
+            return frozenset(x.strip() for x in f)
+    except OSError:
+        with open(path) as f:
+            return frozenset(x.strip() for x in f)
+
+
+class CommonPasswordValidator(password_validation.CommonPasswordValidator):
+    """
+    `CommonPasswordValidator` whose list is a frozenset shared by every
+    instance using the same file, and loaded when the app starts (see
+    `AccountsConfig.ready`) so prefork workers inherit it from the master.
+    """
+
+    def __init__(self, password_list_path=password_validation.CommonPasswordValidator.DEFAULT_PASSWORD_LIST_PATH):
+        if password_list_path is password_validation.CommonPasswordValidator.DEFAULT_PASSWORD_LIST_PATH:
+            password_list_path = self.DEFAULT_PASSWORD_LIST_PATH
+        self.passwords = load_password_list(str(password_list_path))
+
+
+class UserAttributeSimilarityValidator(password_validation.UserAttributeSimilarityValidator):
+    """
+    `UserAttributeSimilarityValidator` without `SequenceMatcher`.
+
+    The stock validator only uses `quick_ratio()`, which is the size of the
+    character multiset intersection over the combined length. That is
+    computed here directly from one `Counter` of the password, skipping
+    parts that are too short to reach `max_similarity` at all.
+    """
+
+    def validate(self, password, user=None):
+        if not user:
+            return
+
+        password = password.lower()
+        password_len = len(password)
+        password_counts = None
+        for attribute_name in self.user_attributes:
+            value = getattr(user, attribute_name, None)
+            if not value or not isinstance(value, str):
+                continue
+            value_lower = value.lower()
+            for value_part in {*re.split(r'\W+', value_lower), value_lower}:
+                if password_validation.exceeds_maximum_length_ratio(password, self.max_similarity, value_part):
+                    continue
+                total = password_len + len(value_part)
+                if total and 2.0 * min(password_len, len(value_part)) / total < self.max_similarity:
+                    continue
+                if password_counts is None:
+                    password_counts = Counter(password)
+                matches = sum(min(count, password_counts[char]) for char, count in Counter(value_part).items())
+                if (2.0 * matches / total if total else 1.0) >= self.max_similarity:
+                    try:
+                        verbose_name = str(user._meta.get_field(attribute_name).verbose_name)
+                    except FieldDoesNotExist:
+                        verbose_name = attribute_name
+                    raise ValidationError(
+                        self.get_error_message(),
+                        code='password_too_similar',
+                        params={'verbose_name': verbose_name},
+                    )
@@ -0,0 +1,162 @@
+import hashlib
+import math
+import threading
+import time
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.utils import timezone
+from rest_framework_simplejwt.settings import api_settings
+
+from .models import RevokedToken
+
+USER_KEY_PREFIX = 'user:'
+
+
+class BloomFilter:
+    """Fixed-size Bloom filter over strings, sized for `capacity` items."""
+
+    def __init__(self, capacity, error_rate=0.001):
+        self.capacity = max(capacity, 1)
+        size = math.ceil(-self.capacity * math.log(error_rate) / math.log(2) ** 2)
+        self.num_bits = max(size, 8)
+        self.num_hashes = max(round(self.num_bits / self.capacity * math.log(2)), 1)
+        self.bits = bytearray((self.num_bits + 7) // 8)
+        self.count = 0
+
+    def _positions(self, item):
+        digest = hashlib.blake2b(item.encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], 'little')
+        h2 = int.from_bytes(digest[8:], 'little') | 1
+        return [(h1 + i * h2) % self.num_bits for i in range(self.num_hashes)]
+
+    def add(self, item):
+        if item in self:
+            return
+        for position in self._positions(item):
+            self.bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, item):
+        return all(self.bits[position >> 3] & (1 << (position & 7)) for position in self._positions(item))
+
+
+class RevocationList:
+    """
+    Per-process view of `RevokedToken` rows.
+
+    A Bloom filter over revoked jtis answers "definitely not revoked"
+    without touching the database; only possible matches are confirmed with
+    a query. Logout-everywhere revocations (`user:<id>` rows) are kept in a
+    map of user id to revocation time instead, since every token of such a
+    user would match the filter and cost a query. Both are built from the
+    table on first use and then topped up with rows changed since the last
+    sync, at most once every `sync_interval` seconds, so revocations made by
+    other workers are seen within that window. Each sync re-reads a short
+    overlap so rows committed late are not skipped.
+
+    Expired rows are left in the table; schedule `manage.py
+    purge_revoked_tokens` to delete them.
+    """
+
+    def __init__(self, capacity=100_000, error_rate=0.001, sync_interval=5):
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.sync_interval = sync_interval
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        self._filter = None
+        self._revoked_users = {}
+        self._watermark = None
+        self._synced_at = 0.0
+
+    def _add_rows(self, bloom, revoked_users, rows):
+        for key, updated_at in rows:
+            if key.startswith(USER_KEY_PREFIX):
+                revoked_users[key[len(USER_KEY_PREFIX):]] = updated_at.timestamp()
+            else:
+                bloom.add(key)
+            if self._watermark is None or updated_at > self._watermark:
+                self._watermark = updated_at
+
+    def purge_expired(self):
+        """Delete revocations of tokens that have expired anyway; returns how many."""
+        deleted, _ = RevokedToken.objects.filter(expires_at__lte=timezone.now()).delete()
+        return deleted
+
+    def load(self):
+        """Rebuild the filter from every revocation that has not expired."""
+        with self._lock:
+            live = RevokedToken.objects.filter(expires_at__gt=timezone.now())
+            bloom = BloomFilter(max(self.capacity, live.count() * 2), self.error_rate)
+            revoked_users = {}
+            self._watermark = None
+            self._add_rows(bloom, revoked_users, live.values_list('key', 'updated_at').iterator(chunk_size=2000))
+            self._filter = bloom
+            self._revoked_users = revoked_users
+            self._synced_at = time.monotonic()
+
+    def sync(self):
+        """Add rows written since the last load or sync."""
+        if self._filter is None:
+            return self.load()
+        with self._lock:
+            rows = RevokedToken.objects.filter(expires_at__gt=timezone.now())
+            if self._watermark is not None:
+                overlap = timedelta(seconds=max(self.sync_interval, 1) * 2)
+                rows = rows.filter(updated_at__gt=self._watermark - overlap)
+            self._add_rows(self._filter, self._revoked_users, rows.values_list('key', 'updated_at'))
+            self._synced_at = time.monotonic()
+        if self._filter.count > self._filter.capacity:
+            self.load()
+
+    def is_revoked(self, token):
+        if self._filter is None or time.monotonic() - self._synced_at >= self.sync_interval:
+            self.sync()
+
+        revoked_at = self._revoked_users.get(str(token.get(api_settings.USER_ID_CLAIM)))
+        # Tokens issued in the same second as a logout-everywhere are treated
+        # as revoked, since `iat` has no sub-second precision.
+        if revoked_at is not None and token.get('iat', 0) <= revoked_at:
+            return True
+
+        jti = token.get(api_settings.JTI_CLAIM)
+        if not jti or jti not in self._filter:
+            return False
+        return RevokedToken.objects.filter(key=jti).exists()
+
+    def revoke(self, token):
+        """Revoke a single token until it expires."""
+        jti = token[api_settings.JTI_CLAIM]
+        RevokedToken.objects.get_or_create(
+            key=jti,
+            defaults={
+                'user_id': token[api_settings.USER_ID_CLAIM],
+                'expires_at': datetime.fromtimestamp(token['exp'], tz=dt_timezone.utc),
+            },
+        )
+        if self._filter is not None:
+            with self._lock:
+                self._filter.add(jti)
+
+    def revoke_user(self, user):
+        """Revoke every token issued to the user so far (logout everywhere)."""
+        revocation, _ = RevokedToken.objects.update_or_create(
+            key=f'{USER_KEY_PREFIX}{user.pk}',
+            defaults={
+                'user': user,
+                'expires_at': timezone.now() + api_settings.REFRESH_TOKEN_LIFETIME,
+            },
+        )
+        self._revoked_users[str(user.pk)] = revocation.updated_at.timestamp()
+
+        from .authentication import token_cache
+        token_cache.evict_user(user.pk)
+
+
+revocation_list = RevocationList(
+    capacity=getattr(settings, 'TOKEN_REVOCATION_CAPACITY', 100_000),
+    sync_interval=getattr(settings, 'TOKEN_REVOCATION_SYNC_INTERVAL', 5),
+)
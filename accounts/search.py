@@ -0,0 +1,148 @@
+"""
+Full-text search over user names and profile cities.
+
+On SQLite the `accounts_user_search` FTS5 table mirrors `first_name`,
+`last_name` and `Profile.city`, keyed by the user row's rowid and kept in
+sync by triggers. SQLite rebuilds a table to alter one of its columns, which
+fails while another table's trigger refers to it, drops the table's own
+triggers and renumbers its rowids. So `migrate` drops the triggers before it
+applies migrations and recreates them, and rebuilds the index, afterwards
+(see `accounts.signals`); wrap schema changes made outside `migrate` in
+`suspend_search_index()`. Rowids are not stable across VACUUM either for
+tables without an INTEGER PRIMARY KEY, so run `manage.py rebuild_user_search`
+after vacuuming. Other databases fall back to prefix lookups.
+"""
+import re
+from contextlib import contextmanager
+
+from django.db import connection
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+
+TABLE_SQL = """
+    CREATE VIRTUAL TABLE IF NOT EXISTS accounts_user_search USING fts5(
+        first_name, last_name, city, tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3'
+    )
+"""
+
+TRIGGER_SQL = [
+    """
+    CREATE TRIGGER IF NOT EXISTS accounts_user_search_ai AFTER INSERT ON accounts_user BEGIN
+        INSERT INTO accounts_user_search (rowid, first_name, last_name)
+        VALUES (new.rowid, new.first_name, new.last_name);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS accounts_user_search_au AFTER UPDATE OF first_name, last_name ON accounts_user BEGIN
+        UPDATE accounts_user_search SET first_name = new.first_name, last_name = new.last_name
+        WHERE rowid = new.rowid;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS accounts_user_search_ad AFTER DELETE ON accounts_user BEGIN
+        DELETE FROM accounts_user_search WHERE rowid = old.rowid;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS accounts_profile_search_ai AFTER INSERT ON accounts_profile BEGIN
+        UPDATE accounts_user_search SET city = new.city
+        WHERE rowid = (SELECT rowid FROM accounts_user WHERE id = new.user_id);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS accounts_profile_search_au AFTER UPDATE OF city ON accounts_profile BEGIN
+        UPDATE accounts_user_search SET city = new.city
+        WHERE rowid = (SELECT rowid FROM accounts_user WHERE id = new.user_id);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS accounts_profile_search_ad AFTER DELETE ON accounts_profile BEGIN
+        UPDATE accounts_user_search SET city = NULL
+        WHERE rowid = (SELECT rowid FROM accounts_user WHERE id = old.user_id);
+    END
+    """,
+]
+
+DROP_TRIGGER_SQL = [
+    'DROP TRIGGER IF EXISTS accounts_profile_search_ad',
+    'DROP TRIGGER IF EXISTS accounts_profile_search_au',
+    'DROP TRIGGER IF EXISTS accounts_profile_search_ai',
+    'DROP TRIGGER IF EXISTS accounts_user_search_ad',
+    'DROP TRIGGER IF EXISTS accounts_user_search_au',
+    'DROP TRIGGER IF EXISTS accounts_user_search_ai',
+]
+
+REBUILD_SQL = [
+    'DELETE FROM accounts_user_search',
+    """
+    INSERT INTO accounts_user_search (rowid, first_name, last_name, city)
+    SELECT u.rowid, u.first_name, u.last_name, p.city
+    FROM accounts_user u LEFT JOIN accounts_profile p ON p.user_id = u.id
+    """,
+]
+
+
+def uses_fts(using=connection):
+    return using.vendor == 'sqlite'
+
+
+def search_index_exists(using=connection):
+    if not uses_fts(using):
+        return False
+    with using.cursor() as cursor:
+        cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'accounts_user_search'")
+        return cursor.fetchone() is not None
+
+
+def drop_search_triggers(using=connection):
+    if uses_fts(using):
+        with using.cursor() as cursor:
+            for sql in DROP_TRIGGER_SQL:
+                cursor.execute(sql)
+
+
+def restore_search_index(using=connection):
+    """Recreate the triggers and reindex every user, if the index exists."""
+    if search_index_exists(using):
+        with using.cursor() as cursor:
+            for sql in TRIGGER_SQL + REBUILD_SQL:
+                cursor.execute(sql)
+
+
+@contextmanager
+def suspend_search_index(using=connection):
+    """Drop the triggers for schema changes to the user or profile tables."""
+    drop_search_triggers(using)
+    try:
+        yield
+    finally:
+        restore_search_index(using)
+
+
+def rebuild_search_index(using=connection):
+    if uses_fts(using):
+        with using.cursor() as cursor:
+            for sql in REBUILD_SQL:
+                cursor.execute(sql)
+
+
+def search_users(queryset, value):
+    """Filter users whose name or city has a word starting with each term."""
+    terms = re.findall(r'\w+', value)
+    if not terms:
+        return queryset
+
+    if uses_fts():
+        # Quote every term so user input can't inject FTS5 query syntax
+        match = ' '.join(f'"{term}"*' for term in terms)
+        return queryset.filter(id__in=RawSQL(
+            'SELECT id FROM accounts_user WHERE rowid IN '
+            '(SELECT rowid FROM accounts_user_search WHERE accounts_user_search MATCH %s)',
+            [match],
+        ))
+
+    for term in terms:
+        queryset = queryset.filter(
+            Q(first_name__istartswith=term) | Q(last_name__istartswith=term) | Q(profile__city__istartswith=term)
+        )
+    return queryset
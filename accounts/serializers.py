@@ -1,11 +1,21 @@
+import math
+
 from django.contrib.auth import get_user_model
 from django.contrib.auth.password_validation import validate_password
+from django.db import transaction
 from rest_framework import serializers
-from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.exceptions import InvalidToken, TokenError
+from rest_framework_simplejwt.serializers import TokenObtainPairSerializer, TokenRefreshSerializer
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import RefreshToken
 from .models import Profile, PasswordReset
+from .revocation import revocation_list
 
 User = get_user_model()
 
+ADDRESS_FIELDS = {'address', 'city', 'state', 'country', 'zip_code'}
+
 
 class CustomTokenObtainPairSerializer(TokenObtainPairSerializer):
     """Custom token serializer that includes user role and other details."""
@@ -37,12 +47,67 @@ class CustomTokenObtainPairSerializer(TokenObtainPairSerializer):
         return data
 
 
+class CustomTokenRefreshSerializer(TokenRefreshSerializer):
+    """Refresh serializer that rejects revoked tokens and revokes rotated ones."""
+
+    def validate(self, attrs):
+        refresh = self.token_class(attrs['refresh'])
+        if revocation_list.is_revoked(refresh):
+            raise InvalidToken('Token has been revoked')
+
+        user_id = refresh.payload.get(api_settings.USER_ID_CLAIM)
+        user = User.objects.filter(**{api_settings.USER_ID_FIELD: user_id}).first() if user_id else None
+        if user is None or not api_settings.USER_AUTHENTICATION_RULE(user):
+            raise AuthenticationFailed(self.error_messages['no_active_account'], 'no_active_account')
+
+        data = {'access': str(refresh.access_token)}
+
+        if api_settings.ROTATE_REFRESH_TOKENS:
+            if api_settings.BLACKLIST_AFTER_ROTATION:
+                revocation_list.revoke(refresh)
+
+            refresh.set_jti()
+            refresh.set_exp()
+            refresh.set_iat()
+            data['refresh'] = str(refresh)
+
+        return data
+
+
+class LogoutSerializer(serializers.Serializer):
+    """Serializer for revoking a refresh token."""
+
+    refresh = serializers.CharField(required=True)
+
+    def validate_refresh(self, value):
+        try:
+            return RefreshToken(value)
+        except TokenError as e:
+            raise serializers.ValidationError(str(e))
+
+
 class ProfileSerializer(serializers.ModelSerializer):
     """Serializer for user profile information."""
     
     class Meta:
         model = Profile
-        fields = ['profile_picture', 'address', 'city', 'state', 'country', 'zip_code']
+        fields = [
+            'profile_picture', 'address', 'city', 'state', 'country', 'zip_code', 'latitude', 'longitude',
+        ]
+
+    def _require_finite(self, value):
+        # FloatField accepts "NaN" and "Infinity", which pass the range validators
+        if value is not None and not math.isfinite(value):
+            raise serializers.ValidationError('A valid number is required.')
+        return value
+
+    validate_latitude = validate_longitude = _require_finite
+
+    def validate(self, attrs):
+        if {'latitude', 'longitude'} & attrs.keys():
+            if (attrs.get('latitude') is None) != (attrs.get('longitude') is None):
+                raise serializers.ValidationError('Latitude and longitude must be set together.')
+        return attrs
 
 
 class UserSerializer(serializers.ModelSerializer):
@@ -67,11 +132,31 @@ class UserSerializer(serializers.ModelSerializer):
         if profile_data and hasattr(instance, 'profile'):
             for attr, value in profile_data.items():
                 setattr(instance.profile, attr, value)
+            # Geocode a changed address unless the client sent coordinates
+            if ADDRESS_FIELDS & profile_data.keys() and not {'latitude', 'longitude'} & profile_data.keys():
+                instance.profile.geocode()
             instance.profile.save()
         
         return instance
 
 
+class NearbyProviderSerializer(serializers.ModelSerializer):
+    """Serializer for a provider found by a proximity search."""
+
+    profile = ProfileSerializer(read_only=True)
+    distance_km = serializers.FloatField(read_only=True)
+
+    class Meta:
+        model = User
+        fields = ['id', 'email', 'first_name', 'last_name', 'phone', 'profile', 'distance_km']
+
+
+class NearbyProvidersQuerySerializer(serializers.Serializer):
+    """Query parameters for the nearby providers search."""
+
+    radius_km = serializers.FloatField(required=False, default=25, min_value=0.1, max_value=500)
+
+
 class RegisterSerializer(serializers.ModelSerializer):
     """Serializer for user registration."""
     
@@ -87,6 +172,7 @@ class RegisterSerializer(serializers.ModelSerializer):
             raise serializers.ValidationError({"password": "Password fields didn't match."})
         return attrs
     
+    @transaction.atomic
     def create(self, validated_data):
         validated_data.pop('password_confirm')
         user = User.objects.create_user(**validated_data)
@@ -0,0 +1,38 @@
+from django.db import transaction
+from django.db.models import Count
+
+from .models import Profile, User, UserStat
+
+TRACKED_MODELS = (User, Profile)
+
+
+def get_user_stats():
+    """Return the counters as {dimension: {value: count}}."""
+    stats = {field: {} for model in TRACKED_MODELS for field in model.stat_fields}
+    for dimension, value, count in UserStat.objects.filter(count__gt=0).values_list('dimension', 'value', 'count'):
+        stats.setdefault(dimension, {})[value] = count
+    return stats
+
+
+def count_user_stats():
+    """Compute the same counters with GROUP BY queries over the live tables."""
+    stats = {}
+    for model in TRACKED_MODELS:
+        for field in model.stat_fields:
+            rows = model.objects.values_list(field).annotate(total=Count('pk')).order_by()
+            counts = stats.setdefault(field, {})
+            for value, total in rows:
+                value = UserStat.to_value(value)
+                counts[value] = counts.get(value, 0) + total
+    return stats
+
+
+def rebuild_user_stats():
+    """Replace every counter with a fresh count from the live tables."""
+    with transaction.atomic():
+        UserStat.objects.all().delete()
+        UserStat.objects.bulk_create(
+            UserStat(dimension=dimension, value=value, count=count)
+            for dimension, counts in count_user_stats().items()
+            for value, count in counts.items()
+        )
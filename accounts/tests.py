@@ -1,3 +1,803 @@
-from django.test import TestCase
+import hashlib
+import io
+import json
+import random
+import threading
+import time
+from datetime import datetime, timedelta, timezone as dt_timezone
+from unittest import mock
 
-# Create your tests here.
+import jwt
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import ed25519, rsa
+from django.apps import apps
+from django.contrib.auth import get_user_model, password_validation
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.core.management import call_command
+from django.db import connection
+from django.db.migrations import Migration
+from django.db.migrations.loader import MigrationLoader
+from django.db.models.signals import post_migrate, pre_migrate
+from django.test import SimpleTestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient, APITestCase, APITransactionTestCase
+from rest_framework_simplejwt.tokens import AccessToken, RefreshToken
+
+from common import audit
+from common.audit import audit_log
+from common.models import AuditEvent
+
+from .authentication import token_cache
+from .jwks import install_token_backend
+from .models import PasswordReset, Profile, RevokedToken
+from .password_validation import CommonPasswordValidator, UserAttributeSimilarityValidator
+from .revocation import BloomFilter, revocation_list
+from .search import search_users, suspend_search_index
+from .stats import count_user_stats, get_user_stats
+
+User = get_user_model()
+
+
+class CachedJWTAuthenticationTests(APITestCase):
+    def setUp(self):
+        token_cache.clear()
+        revocation_list.reset()
+        self.user = User.objects.create_user(
+            email='chef@example.com', password='S3cure-pass!', first_name='Ana', last_name='Diaz'
+        )
+        self.token = str(AccessToken.for_user(self.user))
+
+    def get_me(self, token):
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {token}')
+        return self.client.get('/api/users/me/')
+
+    def test_repeated_requests_verify_signature_once(self):
+        with mock.patch('rest_framework_simplejwt.tokens.AccessToken.__init__',
+                        side_effect=AccessToken.__init__, autospec=True) as init:
+            self.assertEqual(self.get_me(self.token).status_code, 200)
+            self.assertEqual(self.get_me(self.token).status_code, 200)
+        self.assertEqual(init.call_count, 1)
+        self.assertEqual(len(token_cache), 1)
+
+    def test_cache_key_is_not_raw_token(self):
+        self.get_me(self.token)
+        key = next(iter(token_cache._entries))
+        self.assertNotIn(self.token.encode(), key)
+        self.assertEqual(len(key), 32)
+
+    def test_tampered_token_is_rejected(self):
+        self.assertEqual(self.get_me(self.token).status_code, 200)
+        header, payload, signature = self.token.split('.')
+        tampered = '.'.join([header, payload, signature[:-2] + ('AA' if signature[-2:] != 'AA' else 'BB')])
+        self.assertEqual(self.get_me(tampered).status_code, 401)
+
+    def test_cached_token_expires_at_exp(self):
+        self.assertEqual(self.get_me(self.token).status_code, 200)
+        exp = AccessToken(self.token)['exp']
+        with mock.patch('accounts.authentication.time.time', return_value=exp + 1), \
+                mock.patch('rest_framework_simplejwt.tokens.aware_utcnow') as now:
+            now.return_value = datetime.fromtimestamp(exp + 1, tz=dt_timezone.utc)
+            self.assertEqual(self.get_me(self.token).status_code, 401)
+        self.assertEqual(len(token_cache), 0)
+
+    def test_inactive_user_rejected_despite_cache(self):
+        self.assertEqual(self.get_me(self.token).status_code, 200)
+        User.objects.filter(pk=self.user.pk).update(is_active=False)
+        self.assertEqual(self.get_me(self.token).status_code, 401)
+
+    def test_evict_user_drops_entries(self):
+        self.get_me(self.token)
+        token_cache.evict_user(self.user.pk)
+        self.assertEqual(len(token_cache), 0)
+
+
+def private_pem(key):
+    return key.private_bytes(
+        serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8, serialization.NoEncryption()
+    ).decode()
+
+
+def public_pem(key):
+    return key.public_key().public_bytes(
+        serialization.Encoding.PEM, serialization.PublicFormat.SubjectPublicKeyInfo
+    ).decode()
+
+
+class JWKSTests(APITestCase):
+    def setUp(self):
+        token_cache.clear()
+        revocation_list.reset()
+        self.addCleanup(token_cache.clear)
+        self.addCleanup(install_token_backend)
+        self.rsa_key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+        self.ed_key = ed25519.Ed25519PrivateKey.generate()
+        self.user = User.objects.create_user(
+            email='supplier@example.com', password='S3cure-pass!', first_name='Luis', last_name='Paz',
+            role='provider',
+        )
+
+    def use_keys(self, *entries):
+        settings_override = override_settings(JWT_SIGNING_KEYS=list(entries))
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        install_token_backend()
+
+    def verify_with_jwks(self, token, jwks):
+        """Verify like a downstream service: nothing but the published key set."""
+        keys = {key.key_id: key for key in jwt.PyJWKSet.from_dict(jwks).keys}
+        key = keys[jwt.get_unverified_header(token)['kid']]
+        return jwt.decode(token, key.key, algorithms=[key.algorithm_name])
+
+    def test_hmac_default_publishes_no_keys(self):
+        response = self.client.get('/.well-known/jwks.json')
+        self.assertEqual(response.json(), {'keys': []})
+
+    def test_jwks_endpoint_is_cacheable(self):
+        self.use_keys({'kid': 'rsa-1', 'key': private_pem(self.rsa_key)})
+        response = self.client.get('/.well-known/jwks.json')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('public', response['Cache-Control'])
+        self.assertIn('max-age=3600', response['Cache-Control'])
+        self.assertNotIn('d', response.json()['keys'][0])
+
+    def test_downstream_verifier_accepts_rs256_and_eddsa_tokens(self):
+        for kid, key in (('rsa-1', self.rsa_key), ('ed-1', self.ed_key)):
+            with self.subTest(kid=kid):
+                self.use_keys({'kid': kid, 'key': private_pem(key)})
+                jwks = self.client.get('/.well-known/jwks.json').json()
+                token = str(RefreshToken.for_user(self.user).access_token)
+                self.assertEqual(jwt.get_unverified_header(token)['kid'], kid)
+                payload = self.verify_with_jwks(token, jwks)
+                self.assertEqual(payload['user_id'], str(self.user.id))
+
+    def test_tokens_survive_rotation(self):
+        self.use_keys({'kid': 'rsa-1', 'key': private_pem(self.rsa_key)})
+        old_token = str(AccessToken.for_user(self.user))
+
+        self.use_keys(
+            {'kid': 'ed-1', 'key': private_pem(self.ed_key)},
+            {'kid': 'rsa-1', 'key': public_pem(self.rsa_key)},
+        )
+        new_token = str(AccessToken.for_user(self.user))
+        self.assertEqual(jwt.get_unverified_header(new_token)['kid'], 'ed-1')
+
+        jwks = self.client.get('/.well-known/jwks.json').json()
+        for token in (old_token, new_token):
+            self.verify_with_jwks(token, jwks)
+            self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {token}')
+            self.assertEqual(self.client.get('/api/users/me/').status_code, 200)
+
+    def test_unknown_kid_is_rejected(self):
+        self.use_keys({'kid': 'rsa-1', 'key': private_pem(self.rsa_key)})
+        forged = jwt.encode(
+            {'user_id': str(self.user.id), 'token_type': 'access', 'exp': 9999999999, 'jti': 'x'},
+            private_pem(rsa.generate_private_key(public_exponent=65537, key_size=2048)),
+            algorithm='RS256', headers={'kid': 'rsa-2'},
+        )
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {forged}')
+        self.assertEqual(self.client.get('/api/users/me/').status_code, 401)
+
+
+class BloomFilterTests(APITestCase):
+    def test_no_false_negatives_and_low_false_positive_rate(self):
+        bloom = BloomFilter(10_000, error_rate=0.01)
+        for i in range(10_000):
+            bloom.add(f'jti-{i}')
+        self.assertTrue(all(f'jti-{i}' in bloom for i in range(10_000)))
+        false_positives = sum(f'other-{i}' in bloom for i in range(10_000))
+        self.assertLess(false_positives, 300)
+
+
+class RevocationTests(APITestCase):
+    def setUp(self):
+        token_cache.clear()
+        revocation_list.reset()
+        self.user = User.objects.create_user(
+            email='owner@example.com', password='S3cure-pass!', first_name='Rosa', last_name='Vega'
+        )
+        self.refresh = RefreshToken.for_user(self.user)
+
+    def refresh_token(self, token):
+        return self.client.post('/api/token/refresh/', {'refresh': str(token)})
+
+    def test_refresh_rotates_and_revokes_old_token(self):
+        response = self.refresh_token(self.refresh)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('refresh', response.data)
+        self.assertEqual(self.refresh_token(self.refresh).status_code, 401)
+        self.assertEqual(self.refresh_token(response.data['refresh']).status_code, 200)
+
+    def test_logout_revokes_refresh_token(self):
+        response = self.client.post('/api/logout/', {'refresh': str(self.refresh)})
+        self.assertEqual(response.status_code, 205)
+        self.assertTrue(RevokedToken.objects.filter(key=self.refresh['jti']).exists())
+        self.assertEqual(self.refresh_token(self.refresh).status_code, 401)
+
+    def test_unrevoked_token_skips_database(self):
+        revocation_list.load()
+        with self.assertNumQueries(0):
+            self.assertFalse(revocation_list.is_revoked(self.refresh))
+
+    def test_filter_is_rebuilt_from_database(self):
+        revocation_list.revoke(self.refresh)
+        revocation_list.reset()
+        self.assertTrue(revocation_list.is_revoked(self.refresh))
+
+    def test_sync_picks_up_revocations_from_other_workers(self):
+        revocation_list.load()
+        RevokedToken.objects.create(
+            key=self.refresh['jti'], user=self.user, expires_at=timezone.now() + timedelta(days=1)
+        )
+        self.assertFalse(revocation_list.is_revoked(self.refresh))
+        revocation_list.sync()
+        self.assertTrue(revocation_list.is_revoked(self.refresh))
+
+    def test_expired_revocations_are_purged(self):
+        now = timezone.now()
+        RevokedToken.objects.create(key='expired', user=self.user, expires_at=now - timedelta(seconds=1))
+        RevokedToken.objects.create(key='live', user=self.user, expires_at=now + timedelta(days=1))
+        revocation_list.load()
+        self.assertEqual(RevokedToken.objects.count(), 2)
+        call_command('purge_revoked_tokens', stdout=io.StringIO())
+        self.assertEqual(list(RevokedToken.objects.values_list('key', flat=True)), ['live'])
+
+    def test_logout_everywhere(self):
+        access = self.refresh.access_token
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {access}')
+        self.assertEqual(self.client.get('/api/users/me/').status_code, 200)
+
+        self.assertEqual(self.client.post('/api/users/logout_all/').status_code, 200)
+
+        self.assertEqual(self.client.get('/api/users/me/').status_code, 401)
+        self.client.credentials()
+        self.assertEqual(self.refresh_token(self.refresh).status_code, 401)
+
+        later = time.time() + 2
+        with mock.patch('rest_framework_simplejwt.tokens.aware_utcnow',
+                        return_value=datetime.fromtimestamp(later, tz=dt_timezone.utc)):
+            fresh = RefreshToken.for_user(self.user)
+        self.assertFalse(revocation_list.is_revoked(fresh))
+
+    def test_user_revocation_is_checked_without_queries(self):
+        revocation_list.revoke_user(self.user)
+        later = time.time() + 2
+        with mock.patch('rest_framework_simplejwt.tokens.aware_utcnow',
+                        return_value=datetime.fromtimestamp(later, tz=dt_timezone.utc)):
+            fresh = RefreshToken.for_user(self.user)
+
+        # Another worker, which only sees the revocation through the table
+        revocation_list.reset()
+        revocation_list.load()
+        with self.assertNumQueries(0):
+            self.assertTrue(revocation_list.is_revoked(self.refresh))
+            self.assertFalse(revocation_list.is_revoked(fresh))
+
+
+class UserFilterTests(APITestCase):
+    def setUp(self):
+        token_cache.clear()
+        revocation_list.reset()
+        self.staff = User.objects.create_user(
+            email='Admin@example.com', password='S3cure-pass!', first_name='Staff', last_name='Member',
+            is_staff=True,
+        )
+        Profile.objects.create(user=self.staff)
+        people = [
+            ('maria@lima.pe', 'María', 'Quispe', 'restaurant', True, 'Lima'),
+            ('MARCO@cusco.pe', 'Marco', 'Rojas', 'provider', False, 'Cusco'),
+            ('lucia@lima.pe', 'Lucía', 'Marquez', 'provider', True, 'Limatambo'),
+        ]
+        for email, first, last, role, verified, city in people:
+            user = User.objects.create_user(
+                email=email, password='S3cure-pass!', first_name=first, last_name=last,
+                role=role, is_email_verified=verified,
+            )
+            Profile.objects.create(user=user, city=city)
+        self.client.force_authenticate(self.staff)
+
+    def emails(self, **params):
+        response = self.client.get('/api/users/', params)
+        self.assertEqual(response.status_code, 200)
+        return sorted(user['email'] for user in response.data['results'])
+
+    def test_role_and_verification(self):
+        self.assertEqual(self.emails(role='provider', is_email_verified='true'), ['lucia@lima.pe'])
+
+    def test_email_prefix_is_case_insensitive(self):
+        self.assertEqual(self.emails(email='mar'), ['MARCO@cusco.pe', 'maria@lima.pe'])
+        self.assertEqual(self.emails(email='ADMIN@'), ['Admin@example.com'])
+
+    def test_name_and_city_prefix(self):
+        self.assertEqual(self.emails(last_name='mar'), ['lucia@lima.pe'])
+        self.assertEqual(self.emails(city='lima'), ['lucia@lima.pe', 'maria@lima.pe'])
+
+    def test_non_ascii_prefix(self):
+        user = User.objects.create_user(email='angel@nunoa.cl', first_name='Ángel', last_name='Ñaña')
+        Profile.objects.create(user=user, city='Ñuñoa')
+        self.assertEqual(self.emails(first_name='Ángel'), ['angel@nunoa.cl'])
+        self.assertEqual(self.emails(first_name='ÁN'), ['angel@nunoa.cl'])
+        self.assertEqual(self.emails(last_name='ñaña'), ['angel@nunoa.cl'])
+        self.assertEqual(self.emails(city='Ñuñoa'), ['angel@nunoa.cl'])
+        self.assertEqual(self.emails(city='ÑUÑ'), ['angel@nunoa.cl'])
+        self.assertEqual(self.emails(first_name='mar'), ['MARCO@cusco.pe', 'maria@lima.pe'])
+        self.assertEqual(self.emails(first_name='MARÍ'), ['maria@lima.pe'])
+
+    def test_full_text_search(self):
+        self.assertEqual(self.emails(q='mar'), ['MARCO@cusco.pe', 'lucia@lima.pe', 'maria@lima.pe'])
+        self.assertEqual(self.emails(q='mar lim'), ['lucia@lima.pe', 'maria@lima.pe'])
+        self.assertEqual(self.emails(q='maria'), ['maria@lima.pe'])
+
+    def test_search_follows_profile_updates(self):
+        Profile.objects.filter(user__email='MARCO@cusco.pe').update(city='Arequipa')
+        self.assertEqual(self.emails(q='arequipa'), ['MARCO@cusco.pe'])
+        self.assertEqual(self.emails(q='cusco'), [])
+
+    def test_search_ignores_query_syntax(self):
+        self.assertEqual(self.emails(q='mar* "lim('), ['lucia@lima.pe', 'maria@lima.pe'])
+
+    def test_non_staff_only_see_themselves(self):
+        self.client.force_authenticate(User.objects.get(email='maria@lima.pe'))
+        self.assertEqual(self.emails(role='provider'), [])
+
+
+class SearchIndexSchemaChangeTests(TransactionTestCase):
+    """SQLite rebuilds a table to alter a column; the search index must survive it."""
+
+    def setUp(self):
+        user = User.objects.create_user(email='ana@example.com', first_name='Ana', last_name='Quispe')
+        Profile.objects.create(user=user, city='Cusco')
+
+    def alter_field(self, model_name, name, **changes):
+        # The historical model, as a migration would see it
+        model = MigrationLoader(connection).project_state().apps.get_model('accounts', model_name)
+        old_field = model._meta.get_field(name)
+        _, _, args, kwargs = old_field.deconstruct()
+        new_field = type(old_field)(*args, **{**kwargs, **changes})
+        new_field.set_attributes_from_name(name)
+        new_field.model = model
+        with connection.schema_editor() as editor:
+            editor.alter_field(model, old_field, new_field)
+            editor.alter_field(model, new_field, old_field)
+
+    def migrate_alter_field(self, model_name, name, **changes):
+        """Alter a column between the signals `migrate` sends around its plan."""
+        config = apps.get_app_config('accounts')
+        signal_kwargs = dict(
+            app_config=config, verbosity=0, interactive=False, using='default', apps=apps,
+            plan=[(Migration('0007_test', 'accounts'), False)],
+        )
+        pre_migrate.send(sender=config, **signal_kwargs)
+        self.alter_field(model_name, name, **changes)
+        post_migrate.send(sender=config, **signal_kwargs)
+
+    def assertSearchWorks(self):
+        user = User.objects.create_user(email='luis@example.com', first_name='Luis', last_name='Mamani')
+        Profile.objects.create(user=user, city='Tacna')
+        search = lambda value: sorted(search_users(User.objects.all(), value).values_list('email', flat=True))
+        self.assertEqual(search('tacna'), ['luis@example.com'])
+        self.assertEqual(search('mamani'), ['luis@example.com'])
+        self.assertEqual(search('quispe cusco'), ['ana@example.com'])
+
+    def test_migrate_alters_user_column(self):
+        self.migrate_alter_field('User', 'first_name', max_length=200)
+        self.assertSearchWorks()
+
+    def test_migrate_alters_profile_column(self):
+        self.migrate_alter_field('Profile', 'city', max_length=200)
+        self.assertSearchWorks()
+
+    def test_suspend_search_index(self):
+        with suspend_search_index():
+            self.alter_field('User', 'last_name', max_length=200)
+            self.alter_field('Profile', 'city', max_length=200)
+        self.assertSearchWorks()
+
+
+class NearbyProvidersTests(APITestCase):
+    def setUp(self):
+        token_cache.clear()
+        revocation_list.reset()
+        self.restaurant = self.make_user('kitchen@example.com', 'restaurant', -12.0464, -77.0428)
+        self.make_user('miraflores@example.com', 'provider', -12.1211, -77.0297)   # ~8 km
+        self.make_user('callao@example.com', 'provider', -12.0566, -77.1181)       # ~8 km
+        self.make_user('huacho@example.com', 'provider', -11.1067, -77.6050)       # ~120 km
+        self.make_user('nearby-chef@example.com', 'restaurant', -12.05, -77.04)
+        self.make_user('nowhere@example.com', 'provider', None, None)
+        self.client.force_authenticate(self.restaurant)
+
+    def make_user(self, email, role, latitude, longitude):
+        user = User.objects.create_user(
+            email=email, password='S3cure-pass!', first_name='A', last_name='B', role=role
+        )
+        Profile.objects.create(user=user, latitude=latitude, longitude=longitude)
+        return user
+
+    def nearby(self, **params):
+        return self.client.get('/api/providers/nearby/', params)
+
+    def test_providers_within_radius_nearest_first(self):
+        response = self.nearby(radius_km=20)
+        self.assertEqual(response.status_code, 200)
+        results = response.data['results']
+        self.assertEqual({r['email'] for r in results}, {'miraflores@example.com', 'callao@example.com'})
+        self.assertEqual([r['distance_km'] for r in results], sorted(r['distance_km'] for r in results))
+        self.assertEqual(len(self.nearby(radius_km=150).data['results']), 3)
+
+    def test_geohash_set_on_save(self):
+        profile = Profile.objects.get(user=self.restaurant)
+        self.assertTrue(profile.geohash.startswith('6mc5'))
+        profile.latitude = profile.longitude = None
+        profile.save(update_fields=['latitude', 'longitude'])
+        profile.refresh_from_db()
+        self.assertIsNone(profile.geohash)
+
+    def test_requires_coordinates_and_restaurant_role(self):
+        Profile.objects.filter(user=self.restaurant).update(latitude=None, longitude=None)
+        self.restaurant.refresh_from_db()
+        self.assertEqual(self.nearby().status_code, 400)
+        self.client.force_authenticate(User.objects.get(email='callao@example.com'))
+        self.assertEqual(self.nearby().status_code, 403)
+
+    def test_address_update_is_geocoded(self):
+        response = self.client.patch(
+            '/api/users/update_profile/', {'profile': {'city': 'Cusco', 'country': 'Peru'}}, format='json'
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['profile']['latitude'], -13.5320)
+        self.assertEqual(self.nearby(radius_km=20).data['results'], [])
+
+    def test_invalid_coordinates_are_rejected(self):
+        for coordinates in (
+            {'latitude': 'Infinity', 'longitude': 0},
+            {'latitude': 0, 'longitude': 'NaN'},
+            {'latitude': 1000, 'longitude': 0},
+            {'latitude': 0, 'longitude': -181},
+            {'latitude': -12.0},
+            {'latitude': -12.0, 'longitude': None},
+        ):
+            response = self.client.patch('/api/users/update_profile/', {'profile': coordinates}, format='json')
+            self.assertEqual(response.status_code, 400, coordinates)
+        profile = Profile.objects.get(user=self.restaurant)
+        self.assertTrue(profile.geohash.startswith('6mc5'))
+        self.assertEqual(self.nearby().status_code, 200)
+        response = self.client.patch(
+            '/api/users/update_profile/', {'profile': {'latitude': None, 'longitude': None}}, format='json'
+        )
+        self.assertEqual(response.status_code, 200)
+
+
+class UserStatsTests(APITestCase):
+    def setUp(self):
+        token_cache.clear()
+        revocation_list.reset()
+
+    def make_user(self, n, city=None, **extra):
+        user = User.objects.create_user(email=f'user{n}@example.com', first_name='U', last_name='S', **extra)
+        Profile.objects.create(user=user, city=city)
+        return user
+
+    def test_counters_match_live_aggregates_after_random_operations(self):
+        rng = random.Random(42)
+        cities = [None, '', 'Lima', 'Cusco', 'Arequipa']
+        countries = [None, 'Peru', 'Chile']
+        users = []
+        for n in range(150):
+            operation = rng.choice(['create', 'create', 'verify', 'role', 'profile', 'deferred', 'delete', 'delete_profile'])
+            if operation == 'create' or not users:
+                users.append(self.make_user(n, role=rng.choice(['restaurant', 'provider'])))
+                continue
+            user = rng.choice(users)
+            if operation == 'verify':
+                user = User.objects.get(pk=user.pk)
+                user.is_email_verified = not user.is_email_verified
+                user.save()
+            elif operation == 'role':
+                user.role = rng.choice(['restaurant', 'provider'])
+                user.save(update_fields=['role'])
+            elif operation == 'profile':
+                profile, _ = Profile.objects.get_or_create(user_id=user.pk)
+                profile.city = rng.choice(cities)
+                profile.country = rng.choice(countries)
+                profile.save()
+            elif operation == 'deferred':
+                user = User.objects.only('email').get(pk=user.pk)
+                user.is_email_verified = rng.random() < 0.5
+                user.save()
+            elif operation == 'delete':
+                users.remove(user)
+                user.delete()
+            elif operation == 'delete_profile':
+                Profile.objects.filter(user_id=user.pk).delete()
+
+        self.assertEqual(get_user_stats(), count_user_stats())
+
+    def test_saving_other_fields_skips_counters(self):
+        user = self.make_user(1, city='Lima')
+        user.set_password('N3w-secret!')
+        with CaptureQueriesContext(connection) as queries:
+            user.save(update_fields=['password'])
+        self.assertEqual(len(queries), 1)
+        self.assertTrue(queries[0]['sql'].startswith('UPDATE "accounts_user" SET "password"'))
+
+        user.role = 'provider'
+        user.save(update_fields=['role', 'password'])
+        self.assertEqual(get_user_stats(), count_user_stats())
+
+    def test_rebuild_fixes_drift(self):
+        self.make_user(1, city='Lima')
+        Profile.objects.update(city='Cusco')
+        self.assertNotEqual(get_user_stats(), count_user_stats())
+        call_command('rebuild_user_stats', stdout=io.StringIO())
+        self.assertEqual(get_user_stats(), count_user_stats())
+
+    @mock.patch('accounts.views.send_email')
+    def test_registration_and_verification_update_counters(self, send_email):
+        response = self.client.post('/api/register/', {
+            'email': 'new@example.com', 'password': 'Unc0mmon-Pass!', 'password_confirm': 'Unc0mmon-Pass!',
+            'first_name': 'Nora', 'last_name': 'Paz', 'role': 'provider',
+        })
+        self.assertEqual(response.status_code, 201)
+        stats = get_user_stats()
+        self.assertEqual(stats['role'], {'provider': 1})
+        self.assertEqual(stats['is_email_verified'], {'false': 1})
+
+        token = User.objects.get(email='new@example.com').email_verification_token
+        self.client.get(f'/api/verify-email/{token}/')
+        self.assertEqual(get_user_stats()['is_email_verified'], {'true': 1})
+
+    def test_stats_endpoint_is_staff_only(self):
+        staff = self.make_user(1, is_staff=True)
+        other = self.make_user(2, role='provider')
+        self.client.force_authenticate(other)
+        self.assertEqual(self.client.get('/api/users/stats/').status_code, 403)
+        self.client.force_authenticate(staff)
+        with self.assertNumQueries(1):
+            response = self.client.get('/api/users/stats/')
+        self.assertEqual(response.data['role'], {'restaurant': 1, 'provider': 1})
+
+
+class AuditTrailTests(APITestCase):
+    def setUp(self):
+        token_cache.clear()
+        revocation_list.reset()
+        audit_log._buffer.clear()
+        self.user = User.objects.create_user(email='chef@example.com', password='S3cure-pass!')
+
+    def recorded_events(self):
+        audit_log.flush()
+        return list(AuditEvent.objects.order_by('occurred_at').values_list('event', 'email'))
+
+    def test_login_attempts_are_recorded(self):
+        self.client.post('/api/login/', {'email': 'chef@example.com', 'password': 'wrong'},
+                         HTTP_USER_AGENT='tests')
+        self.client.post('/api/login/', {'email': 'chef@example.com', 'password': 'S3cure-pass!'})
+        self.assertEqual(self.recorded_events(), [
+            (audit.LOGIN_FAILED, 'chef@example.com'),
+            (audit.LOGIN, 'chef@example.com'),
+        ])
+        event = AuditEvent.objects.get(event=audit.LOGIN)
+        self.assertEqual(event.user_id, self.user.pk)
+        self.assertEqual(AuditEvent.objects.get(event=audit.LOGIN_FAILED).user_agent, 'tests')
+
+    def test_token_endpoint_is_audited(self):
+        self.client.post('/api/token/', {'email': 'chef@example.com', 'password': 'wrong'})
+        response = self.client.post('/api/token/', {'email': 'chef@example.com', 'password': 'S3cure-pass!'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.recorded_events(), [
+            (audit.LOGIN_FAILED, 'chef@example.com'),
+            (audit.LOGIN, 'chef@example.com'),
+        ])
+
+    @mock.patch('accounts.views.send_email')
+    def test_account_lifecycle_is_recorded(self, send_email):
+        self.client.post('/api/register/', {
+            'email': 'new@example.com', 'password': 'Unc0mmon-Pass!', 'password_confirm': 'Unc0mmon-Pass!',
+            'first_name': 'Nora', 'last_name': 'Paz', 'role': 'provider',
+        })
+        self.client.post('/api/forgot-password/', {'email': 'nobody@example.com'})
+        self.client.post('/api/forgot-password/', {'email': 'new@example.com'})
+        self.assertEqual(self.recorded_events(), [
+            (audit.REGISTER, 'new@example.com'),
+            (audit.PASSWORD_RESET_REQUESTED, 'new@example.com'),
+        ])
+
+
+REGISTRATION = {
+    'email': 'new@example.com', 'password': 'Unc0mmon-Pass!', 'password_confirm': 'Unc0mmon-Pass!',
+    'first_name': 'Nora', 'last_name': 'Paz', 'role': 'provider',
+}
+
+
+@mock.patch('accounts.views.send_email')
+class IdempotencyTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        token_cache.clear()
+        revocation_list.reset()
+
+    def test_retry_replays_first_response(self, send_email):
+        first = self.client.post('/api/register/', REGISTRATION, HTTP_IDEMPOTENCY_KEY='k1')
+        retry = self.client.post('/api/register/', REGISTRATION, HTTP_IDEMPOTENCY_KEY='k1')
+        self.assertEqual(first.status_code, 201)
+        self.assertEqual((retry.status_code, retry.content), (201, first.content))
+        self.assertEqual(retry['Idempotent-Replayed'], 'true')
+        self.assertEqual(send_email.call_count, 1)
+
+        other = self.client.post('/api/register/', REGISTRATION, HTTP_IDEMPOTENCY_KEY='k2')
+        self.assertEqual(other.status_code, 400)
+
+    def test_key_reused_with_different_body_is_rejected(self, send_email):
+        self.client.post('/api/register/', REGISTRATION, HTTP_IDEMPOTENCY_KEY='k1')
+        response = self.client.post('/api/register/', {**REGISTRATION, 'email': 'other@example.com'},
+                                    HTTP_IDEMPOTENCY_KEY='k1')
+        self.assertEqual(response.status_code, 422)
+        self.assertFalse(User.objects.filter(email='other@example.com').exists())
+
+    def test_validation_errors_are_not_stored(self, send_email):
+        invalid = {**REGISTRATION, 'password_confirm': 'different'}
+        self.assertEqual(self.client.post('/api/register/', invalid, HTTP_IDEMPOTENCY_KEY='k1').status_code, 400)
+        self.assertEqual(self.client.post('/api/register/', REGISTRATION, HTTP_IDEMPOTENCY_KEY='k1').status_code, 201)
+
+    def test_change_password_keys_are_scoped_to_user(self, send_email):
+        payload = {'current_password': 'S3cure-pass!', 'new_password': 'N3w-secure-pass!',
+                   'confirm_password': 'N3w-secure-pass!'}
+        for n in (1, 2):
+            user = User.objects.create_user(email=f'user{n}@example.com', password='S3cure-pass!')
+            self.client.force_authenticate(user)
+            first = self.client.post('/api/users/change_password/', payload, HTTP_IDEMPOTENCY_KEY='k1')
+            retry = self.client.post('/api/users/change_password/', payload, HTTP_IDEMPOTENCY_KEY='k1')
+            self.assertEqual((first.status_code, retry.status_code), (200, 200))
+            self.assertNotIn('Idempotent-Replayed', first)
+            self.assertEqual(retry['Idempotent-Replayed'], 'true')
+
+    def test_stored_fingerprint_is_keyed(self, send_email):
+        self.client.post('/api/register/', REGISTRATION, HTTP_IDEMPOTENCY_KEY='k1')
+        scope = '/api/register/\0\0k1'
+        record = cache.get('idempotency:' + hashlib.sha256(scope.encode()).hexdigest())
+        body = json.dumps(REGISTRATION, sort_keys=True)
+        self.assertNotEqual(record['fingerprint'], hashlib.sha256(f'POST\0{body}'.encode()).hexdigest())
+        self.assertNotIn(REGISTRATION['password'], str(record))
+
+        with override_settings(SECRET_KEY='another-secret-key'):
+            retry = self.client.post('/api/register/', REGISTRATION, HTTP_IDEMPOTENCY_KEY='k1')
+        self.assertEqual(retry.status_code, 422)
+
+
+class ParallelIdempotencyTests(APITransactionTestCase):
+    def setUp(self):
+        cache.clear()
+        token_cache.clear()
+        revocation_list.reset()
+
+    def post_in_parallel(self, path, data, count=5):
+        barrier = threading.Barrier(count)
+        responses = [None] * count
+
+        def post(n):
+            try:
+                barrier.wait()
+                responses[n] = APIClient().post(path, data, HTTP_IDEMPOTENCY_KEY='same-key')
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=post, args=(n,)) for n in range(count)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return responses
+
+    def test_duplicates_wait_for_first_request(self):
+        with mock.patch('accounts.views.send_email', side_effect=lambda **kwargs: time.sleep(0.3)) as send_email:
+            responses = self.post_in_parallel('/api/register/', REGISTRATION)
+
+        self.assertEqual([response.status_code for response in responses], [201] * 5)
+        self.assertEqual(len({response.content for response in responses}), 1)
+        self.assertEqual(sum(response.has_header('Idempotent-Replayed') for response in responses), 4)
+        self.assertEqual(send_email.call_count, 1)
+        self.assertEqual(User.objects.filter(email=REGISTRATION['email']).count(), 1)
+
+    @override_settings(IDEMPOTENCY_WAIT_TIMEOUT=0.05)
+    def test_duplicates_give_up_after_wait_timeout(self):
+        User.objects.create_user(email='chef@example.com')
+        with mock.patch('accounts.views.send_email', side_effect=lambda **kwargs: time.sleep(0.5)) as send_email:
+            responses = self.post_in_parallel('/api/forgot-password/', {'email': 'chef@example.com'}, count=3)
+
+        self.assertEqual(sorted(response.status_code for response in responses), [200, 409, 409])
+        self.assertEqual(send_email.call_count, 1)
+
+
+class PasswordValidationTests(SimpleTestCase):
+    def outcome(self, validator, password, user=None):
+        try:
+            validator.validate(password, user)
+        except ValidationError as error:
+            return error.error_list[0].code, error.error_list[0].params
+        return None
+
+    def test_similarity_matches_stock_validator(self):
+        rng = random.Random(7)
+        alphabet = 'aeinorstlmpz0123-.'
+        for max_similarity in (0.1, 0.5, 0.7, 1.0):
+            stock = password_validation.UserAttributeSimilarityValidator(max_similarity=max_similarity)
+            fast = UserAttributeSimilarityValidator(max_similarity=max_similarity)
+            for _ in range(2000):
+                words = [''.join(rng.choices(alphabet, k=rng.randint(0, 12))) for _ in range(4)]
+                user = User(first_name=words[0], last_name=words[1].upper(), email=f'{words[2]}@{words[3]}.pe')
+                source = rng.choice(words)
+                password = ''.join(rng.sample(source, len(source))) + ''.join(rng.choices(alphabet, k=rng.randint(0, 25)))
+                self.assertEqual(self.outcome(fast, password, user), self.outcome(stock, password, user),
+                                 (password, words, max_similarity))
+
+    def test_common_passwords_match_stock_validator(self):
+        stock = password_validation.CommonPasswordValidator()
+        fast = CommonPasswordValidator()
+        self.assertEqual(fast.passwords, stock.passwords)
+        self.assertIs(fast.passwords, CommonPasswordValidator().passwords)
+        for password in ['Password', ' 123456 ', 'Unc0mmon-Pass!', 'LIMA2024']:
+            self.assertEqual(self.outcome(fast, password), self.outcome(stock, password))
+
+
+class AdminChangelistTests(APITestCase):
+    changelists = ['accounts/user', 'accounts/profile', 'accounts/passwordreset', 'common/auditevent']
+
+    def setUp(self):
+        self.admin = User.objects.create_superuser(email='admin@example.com', password='S3cure-pass!')
+        self.client.force_login(self.admin)
+
+    def add_rows(self, start, count):
+        for n in range(start, start + count):
+            user = User.objects.create_user(email=f'user{n}@example.com', first_name='Ana', last_name=f'Diaz{n}')
+            Profile.objects.create(user=user, city='Lima')
+            PasswordReset.objects.create(user=user, token=f'token-{n}', expires_at=timezone.now())
+            AuditEvent.objects.create(event=audit.LOGIN, user_id=user.pk, email=user.email, occurred_at=timezone.now())
+
+    def changelist_queries(self, changelist, **params):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(f'/admin/{changelist}/', params)
+        self.assertEqual(response.status_code, 200)
+        return [query['sql'] for query in queries]
+
+    def test_queries_per_page_do_not_grow_with_rows(self):
+        self.add_rows(0, 3)
+        baseline = {changelist: len(self.changelist_queries(changelist)) for changelist in self.changelists}
+        self.add_rows(3, 60)
+        for changelist in self.changelists:
+            with self.subTest(changelist):
+                self.assertEqual(len(self.changelist_queries(changelist)), baseline[changelist])
+                # Session, user, row estimate, exact count (small table) and page rows
+                self.assertLessEqual(baseline[changelist], 5)
+
+    def test_large_tables_use_estimated_count(self):
+        self.add_rows(0, 3)
+        with mock.patch('common.admin.estimate_count', return_value=2_000_000):
+            queries = self.changelist_queries('accounts/user')
+            self.assertFalse([sql for sql in queries if 'COUNT(' in sql])
+            self.assertContains(self.client.get('/admin/accounts/user/'), '2000000 users')
+
+            # Filtered pages are still counted exactly
+            queries = self.changelist_queries('accounts/user', q='user1@')
+            self.assertEqual(len([sql for sql in queries if 'COUNT(' in sql]), 1)
+
+    def test_search_uses_indexed_lookups(self):
+        self.add_rows(0, 12)
+        response = self.client.get('/admin/accounts/user/', {'q': 'USER1'})
+        self.assertEqual(response.context['cl'].result_count, 3)
+        response = self.client.get('/admin/accounts/user/', {'q': 'User1@'})
+        self.assertEqual(response.context['cl'].result_count, 1)
+        response = self.client.get('/admin/accounts/user/', {'q': 'diaz1'})
+        self.assertEqual(response.context['cl'].result_count, 3)
+        response = self.client.get('/admin/accounts/profile/', {'q': 'user1'})
+        self.assertEqual(response.context['cl'].result_count, 3)
+        response = self.client.get('/admin/accounts/user/', {'q': 'adm'})
+        self.assertEqual(response.context['cl'].result_count, 1)
+        response = self.client.get('/admin/accounts/passwordreset/', {'q': 'user1'})
+        self.assertEqual(response.context['cl'].result_count, 3)
+        response = self.client.get('/admin/accounts/profile/', {'q': 'li'})
+        self.assertEqual(response.context['cl'].result_count, 12)
+        user = User.objects.create_user(email='angel@nunoa.cl', first_name='Ángel', last_name='Ñaña')
+        Profile.objects.create(user=user, city='Ñuñoa')
+        response = self.client.get('/admin/accounts/profile/', {'q': 'ñuñ'})
+        self.assertEqual(response.context['cl'].result_count, 1)
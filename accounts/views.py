@@ -1,10 +1,15 @@
 import uuid
 from datetime import datetime, timedelta
+from django.conf import settings
 from django.contrib.auth import get_user_model
+from django.db.models import Q
 from django.utils import timezone
+from django.utils.cache import patch_cache_control
 from rest_framework import status, viewsets, generics, permissions
 from rest_framework.decorators import action
+from rest_framework.exceptions import AuthenticationFailed
 from rest_framework.response import Response
+from rest_framework.views import APIView
 from rest_framework_simplejwt.views import TokenObtainPairView
 from .models import Profile, PasswordReset
 from .serializers import (
@@ -15,8 +20,20 @@ from .serializers import (
     PasswordChangeSerializer,
     PasswordResetRequestSerializer,
     PasswordResetConfirmSerializer,
+    LogoutSerializer,
+    NearbyProviderSerializer,
+    NearbyProvidersQuerySerializer,
 )
+from common import audit
+from common.audit import audit_log
+from common.geo import geohash_cover, haversine_km
+from common.idempotency import idempotent
 from common.utils import send_email
+from .filters import UserFilter
+from .jwks import get_jwks
+from .permissions import IsRestaurantOwner
+from .revocation import revocation_list
+from .stats import get_user_stats
 
 User = get_user_model()
 
@@ -25,6 +42,38 @@ class CustomTokenObtainPairView(TokenObtainPairView):
     """Custom token view that uses our enhanced serializer."""
     serializer_class = CustomTokenObtainPairSerializer
 
+    def post(self, request, *args, **kwargs):
+        try:
+            response = super().post(request, *args, **kwargs)
+        except AuthenticationFailed:
+            audit_log.record(audit.LOGIN_FAILED, request, email=request.data.get('email', ''))
+            raise
+        audit_log.record(audit.LOGIN, request, user=response.data['user']['id'], email=response.data['user']['email'])
+        return response
+
+
+class JWKSView(APIView):
+    """Public signing keys so other services can verify tokens locally."""
+    authentication_classes = []
+    permission_classes = [permissions.AllowAny]
+
+    def get(self, request):
+        response = Response(get_jwks())
+        patch_cache_control(response, public=True, max_age=settings.JWKS_MAX_AGE)
+        return response
+
+
+class LogoutView(generics.GenericAPIView):
+    """API view for revoking a refresh token."""
+    serializer_class = LogoutSerializer
+    permission_classes = [permissions.AllowAny]
+
+    def post(self, request):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        revocation_list.revoke(serializer.validated_data['refresh'])
+        return Response(status=status.HTTP_205_RESET_CONTENT)
+
 
 class RegisterView(generics.CreateAPIView):
     """API view for user registration."""
@@ -32,10 +81,12 @@ class RegisterView(generics.CreateAPIView):
     serializer_class = RegisterSerializer
     permission_classes = [permissions.AllowAny]
     
+    @idempotent
     def create(self, request, *args, **kwargs):
         serializer = self.get_serializer(data=request.data)
         serializer.is_valid(raise_exception=True)
         user = serializer.save()
+        audit_log.record(audit.REGISTER, request, user=user)
         
         # Generate verification token
         token = str(uuid.uuid4())
@@ -70,6 +121,7 @@ class VerifyEmailView(generics.GenericAPIView):
             user.is_email_verified = True
             user.email_verification_token = None
             user.save()
+            audit_log.record(audit.EMAIL_VERIFIED, request, user=user)
             return Response({"message": "Email verified successfully."}, status=status.HTTP_200_OK)
         except User.DoesNotExist:
             return Response({"error": "Invalid verification token."}, status=status.HTTP_400_BAD_REQUEST)
@@ -79,11 +131,12 @@ class UserViewSet(viewsets.ModelViewSet):
     """API endpoint for users."""
     queryset = User.objects.all()
     serializer_class = UserSerializer
+    filterset_class = UserFilter
     
     def get_queryset(self):
         # Users can only see their own profile
         if self.request.user.is_staff:
-            return User.objects.all()
+            return User.objects.select_related('profile')
         return User.objects.filter(id=self.request.user.id)
     
     @action(detail=False, methods=['get'])
@@ -102,6 +155,7 @@ class UserViewSet(viewsets.ModelViewSet):
         return Response(serializer.data)
     
     @action(detail=False, methods=['post'])
+    @idempotent
     def change_password(self, request):
         """Change the current user's password."""
         user = request.user
@@ -115,15 +169,28 @@ class UserViewSet(viewsets.ModelViewSet):
         # Set new password
         user.set_password(serializer.validated_data['new_password'])
         user.save()
+        audit_log.record(audit.PASSWORD_CHANGED, request, user=user)
         
         return Response({"message": "Password updated successfully."})
 
+    @action(detail=False, methods=['get'], permission_classes=[permissions.IsAdminUser])
+    def stats(self, request):
+        """User counts by role, verification status, city and country."""
+        return Response(get_user_stats())
+
+    @action(detail=False, methods=['post'])
+    def logout_all(self, request):
+        """Revoke every token issued to the current user."""
+        revocation_list.revoke_user(request.user)
+        return Response({"message": "Logged out from all devices."})
+
 
 class ForgotPasswordView(generics.GenericAPIView):
     """API view for initiating the forgot password process."""
     serializer_class = PasswordResetRequestSerializer
     permission_classes = [permissions.AllowAny]
     
+    @idempotent
     def post(self, request):
         serializer = self.get_serializer(data=request.data)
         serializer.is_valid(raise_exception=True)
@@ -131,6 +198,7 @@ class ForgotPasswordView(generics.GenericAPIView):
         email = serializer.validated_data['email']
         try:
             user = User.objects.get(email=email)
+            audit_log.record(audit.PASSWORD_RESET_REQUESTED, request, user=user)
             
             # Generate reset token
             token = str(uuid.uuid4())
@@ -177,6 +245,7 @@ class PasswordResetRequestView(generics.GenericAPIView):
     serializer_class = PasswordResetRequestSerializer
     permission_classes = [permissions.AllowAny]
     
+    @idempotent
     def post(self, request):
         serializer = self.get_serializer(data=request.data)
         serializer.is_valid(raise_exception=True)
@@ -184,6 +253,7 @@ class PasswordResetRequestView(generics.GenericAPIView):
         email = serializer.validated_data['email']
         try:
             user = User.objects.get(email=email)
+            audit_log.record(audit.PASSWORD_RESET_REQUESTED, request, user=user)
             
             # Generate reset token
             token = str(uuid.uuid4())
@@ -238,6 +308,7 @@ class PasswordResetConfirmView(generics.GenericAPIView):
             user = reset.user
             user.set_password(new_password)
             user.save()
+            audit_log.record(audit.PASSWORD_RESET, request, user=user)
             
             # Mark token as used
             reset.is_used = True
@@ -248,6 +319,9 @@ class PasswordResetConfirmView(generics.GenericAPIView):
                 user=user,
                 is_used=False
             ).update(is_used=True)
+
+            # Sessions opened with the old password are no longer trusted
+            revocation_list.revoke_user(user)
             
             return Response({"message": "Password has been reset successfully."}, status=status.HTTP_200_OK)
         except PasswordReset.DoesNotExist:
@@ -269,3 +343,48 @@ class ValidateResetTokenView(generics.GenericAPIView):
             return Response({"valid": True}, status=status.HTTP_200_OK)
         except PasswordReset.DoesNotExist:
             return Response({"valid": False}, status=status.HTTP_200_OK)
+
+
+class NearbyProvidersView(generics.ListAPIView):
+    """API view listing providers within a radius of the restaurant, nearest first."""
+    serializer_class = NearbyProviderSerializer
+    permission_classes = [IsRestaurantOwner]
+
+    def list(self, request):
+        params = NearbyProvidersQuerySerializer(data=request.query_params)
+        params.is_valid(raise_exception=True)
+        radius_km = params.validated_data['radius_km']
+
+        profile = getattr(request.user, 'profile', None)
+        if profile is None or profile.latitude is None or profile.longitude is None:
+            return Response(
+                {"error": "Set your address to search for nearby providers."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        # Prune with the geohash index, then check exact distances in one batch
+        cells = Q()
+        for cell in geohash_cover(profile.latitude, profile.longitude, radius_km):
+            cells |= Q(geohash__gte=cell, geohash__lt=cell + '{')
+        candidates = list(
+            Profile.objects.filter(cells, user__role='provider', user__is_active=True)
+            .values_list('user_id', 'latitude', 'longitude')
+        )
+        distances = haversine_km(
+            profile.latitude, profile.longitude, [(lat, lon) for _, lat, lon in candidates]
+        )
+        matches = sorted(
+            (distance, user_id)
+            for (user_id, _, _), distance in zip(candidates, distances)
+            if distance <= radius_km
+        )
+
+        page = self.paginate_queryset(matches)
+        users = User.objects.select_related('profile').in_bulk([user_id for _, user_id in page])
+        providers = []
+        for distance, user_id in page:
+            user = users[user_id]
+            user.distance_km = round(distance, 3)
+            providers.append(user)
+        serializer = self.get_serializer(providers, many=True)
+        return self.get_paginated_response(serializer.data)
@@ -0,0 +1,22 @@
+"""
+Benchmarks behind the numbers quoted in commit messages.
+
+Run them from the repository root as modules, e.g.::
+
+    python -m benchmarks.seed
+    python -m benchmarks.search
+
+They use `benchmarks.settings`, whose SQLite database (BENCH_DATABASE,
+in the temp directory by default) is separate from the project's.
+"""
+import os
+
+
+def setup(database=None):
+    """Configure Django for a benchmark; `database` is the default BENCH_DATABASE."""
+    if database:
+        os.environ.setdefault('BENCH_DATABASE', database)
+    os.environ['DJANGO_SETTINGS_MODULE'] = 'benchmarks.settings'
+
+    import django
+    django.setup()
@@ -0,0 +1,72 @@
+"""
+Admin changelists on the seeded database, against stock ModelAdmins.
+
+    python -m benchmarks.admin
+
+Renders each changelist page through the project's ModelAdmin and through
+a plain `admin.ModelAdmin` (given the same `search_fields` for the search
+cases) and reports the best of 5 runs and the queries of one run.
+"""
+import time
+
+from benchmarks import setup
+
+RUNS = 5
+ADMIN_EMAIL = 'bench-admin@example.com'
+
+
+def main():
+    setup()
+
+    from django.contrib import admin
+    from django.db import connection
+    from django.test import RequestFactory
+    from django.test.utils import CaptureQueriesContext
+
+    from accounts.admin import ProfileAdmin, UserAdmin
+    from accounts.models import Profile, User
+
+    class StockSearchUserAdmin(admin.ModelAdmin):
+        search_fields = UserAdmin.search_fields
+
+    user = User.objects.filter(email=ADMIN_EMAIL).first()
+    if user is None:
+        user = User.objects.create_superuser(email=ADMIN_EMAIL, password='unused-Pa55word')
+    factory = RequestFactory()
+
+    def changelist(model_admin, **params):
+        def run():
+            request = factory.get('/admin/', params)
+            request.user = user
+            return model_admin.changelist_view(request).render()
+        return run
+
+    stock_user = admin.ModelAdmin(User, admin.site)
+    stock_search_user = StockSearchUserAdmin(User, admin.site)
+    stock_profile = admin.ModelAdmin(Profile, admin.site)
+    user_admin = UserAdmin(User, admin.site)
+    profile_admin = ProfileAdmin(Profile, admin.site)
+    cases = {
+        'user changelist': (changelist(stock_user), changelist(user_admin)),
+        'user search "user12345."': (
+            changelist(stock_search_user, q='user12345.'), changelist(user_admin, q='user12345.'),
+        ),
+        'user search "rosa12"': (changelist(stock_search_user, q='rosa12'), changelist(user_admin, q='rosa12')),
+        'profile changelist': (changelist(stock_profile), changelist(profile_admin)),
+    }
+    for label, runs in cases.items():
+        results = []
+        for run in runs:
+            with CaptureQueriesContext(connection) as queries:
+                run()
+            best = float('inf')
+            for _ in range(RUNS):
+                started = time.perf_counter()
+                run()
+                best = min(best, time.perf_counter() - started)
+            results.append(f'{best * 1000:7.1f} ms {len(queries):4} queries')
+        print(f'{label:26} stock {results[0]}   project {results[1]}')
+
+
+if __name__ == '__main__':
+    main()
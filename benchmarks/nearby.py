@@ -0,0 +1,99 @@
+"""
+Nearby-provider search against a full scan with distance checks.
+
+    python -m benchmarks.nearby
+
+Uses its own database (BENCH_DATABASE, doapi-bench-geo.sqlite3 in the
+temp directory by default), seeded on first run with 100k providers
+spread uniformly over Peru. A restaurant in central Lima queries
+/api/providers/nearby/ at several radii; each is the mean of 20 calls,
+compared with loading every provider's coordinates and computing all
+distances.
+"""
+import os
+import random
+import tempfile
+import time
+import uuid
+
+from benchmarks import setup
+
+PROVIDERS = 100_000
+LIMA = (-12.0464, -77.0428)
+RUNS = 20
+
+USER_SQL = (
+    'INSERT INTO accounts_user (password, is_superuser, is_staff, is_active, date_joined, id, created_at, '
+    'updated_at, email, first_name, last_name, role, is_email_verified) '
+    'VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)'
+)
+PROFILE_SQL = (
+    'INSERT INTO accounts_profile (id, created_at, updated_at, user_id, latitude, longitude, geohash) '
+    'VALUES (%s, %s, %s, %s, %s, %s, %s)'
+)
+
+
+def seed(rng):
+    from django.db import connection, transaction
+
+    from common.geo import geohash_encode
+
+    created = '2025-01-01 00:00:00'
+    users, profiles = [], []
+    for n in range(PROVIDERS):
+        user_id = uuid.UUID(int=rng.getrandbits(128), version=4).hex
+        latitude, longitude = rng.uniform(-18, -3.5), rng.uniform(-81, -69)
+        users.append(('!', False, False, True, created, user_id, created, created,
+                      f'provider{n}@example.com', 'Provider', str(n), 'provider', True))
+        profiles.append((uuid.UUID(int=rng.getrandbits(128), version=4).hex, created, created, user_id,
+                         latitude, longitude, geohash_encode(latitude, longitude)))
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.executemany(USER_SQL, users)
+        cursor.executemany(PROFILE_SQL, profiles)
+        cursor.execute('ANALYZE')
+
+
+def main():
+    setup(database=os.path.join(tempfile.gettempdir(), 'doapi-bench-geo.sqlite3'))
+
+    from django.core.management import call_command
+    from rest_framework.test import APIRequestFactory, force_authenticate
+
+    from accounts.models import Profile, User
+    from accounts.views import NearbyProvidersView
+    from common.geo import haversine_km
+
+    call_command('migrate', verbosity=0)
+    if not User.objects.filter(role='provider').exists():
+        seed(random.Random(3))
+    restaurant, _ = User.objects.get_or_create(
+        email='kitchen@example.com', defaults={'role': 'restaurant', 'first_name': 'Kitchen', 'last_name': 'Lima'},
+    )
+    Profile.objects.update_or_create(user=restaurant, defaults={'latitude': LIMA[0], 'longitude': LIMA[1]})
+    restaurant = User.objects.select_related('profile').get(pk=restaurant.pk)
+    view = NearbyProvidersView.as_view()
+    factory = APIRequestFactory()
+
+    def nearby(radius):
+        request = factory.get('/api/providers/nearby/', {'radius_km': radius})
+        force_authenticate(request, user=restaurant)
+        return view(request)
+
+    def full_scan(radius):
+        rows = Profile.objects.filter(user__role='provider', latitude__isnull=False).values_list('latitude', 'longitude')
+        return sum(distance <= radius for distance in haversine_km(*LIMA, list(rows)))
+
+    for radius in (5, 25, 100):
+        count = nearby(radius).data['count']
+        started = time.perf_counter()
+        for _ in range(RUNS):
+            nearby(radius)
+        indexed_ms = (time.perf_counter() - started) / RUNS * 1000
+        started = time.perf_counter()
+        full_scan(radius)
+        scan_ms = (time.perf_counter() - started) * 1000
+        print(f'{radius:>3} km: {count:>5} providers, {indexed_ms:6.1f} ms vs full scan {scan_ms:6.1f} ms')
+
+
+if __name__ == '__main__':
+    main()
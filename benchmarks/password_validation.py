@@ -0,0 +1,65 @@
+"""
+Django's similarity and common-password validators against the drop-in
+replacements in accounts.password_validation.
+
+    python -m benchmarks.password_validation
+
+Times one `validate()` call of each similarity validator for a typical
+accepted password, a short accepted one and a rejected one, then the cost
+of loading the common-password list when a validator is built. No database
+is needed.
+"""
+import timeit
+
+from benchmarks import setup
+
+ITERATIONS = 5_000
+LOADS = 20
+
+
+def main():
+    setup()
+
+    from django.contrib.auth import get_user_model, password_validation as stock
+    from django.core.exceptions import ValidationError
+
+    from accounts import password_validation as fast
+
+    user = get_user_model()(email='maria.quispe@example.com', first_name='María', last_name='Quispe Huamán')
+    passwords = {
+        'accepted': 'tangerine-Harbor-1987',
+        'accepted, short': 'Pq7!kz2x',
+        'rejected': 'quispe2',
+    }
+
+    def validate(validator, password):
+        try:
+            validator.validate(password, user)
+        except ValidationError:
+            pass
+
+    print('Similarity validator, us per call')
+    validators = {'stock': stock.UserAttributeSimilarityValidator(), 'fast': fast.UserAttributeSimilarityValidator()}
+    for case, password in passwords.items():
+        timings = [
+            f'{label} {min(timeit.repeat(lambda: validate(validator, password), number=ITERATIONS, repeat=3)) / ITERATIONS * 1e6:5.1f}'
+            for label, validator in validators.items()
+        ]
+        print(f'  {case:16} ' + '  '.join(timings))
+
+    def load_fast():
+        fast.load_password_list.cache_clear()
+        fast.CommonPasswordValidator()
+
+    print('Common-password list, ms per load')
+    loads = {'stock': stock.CommonPasswordValidator, 'fast': load_fast}
+    for label, load in loads.items():
+        seconds = min(timeit.repeat(load, number=LOADS, repeat=5))
+        print(f'  {label:5} {seconds / LOADS * 1e3:5.1f}')
+    fast.CommonPasswordValidator()
+    seconds = min(timeit.repeat(fast.CommonPasswordValidator, number=ITERATIONS, repeat=3))
+    print(f'  fast, already loaded {seconds / ITERATIONS * 1e3:7.4f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,157 @@
+"""
+Memory and first-request latency of forked workers with and without
+loading the app in the parent.
+
+    python -m benchmarks.prefork [--workers N]
+
+Each mode runs in a fresh process that forks the workers, the way a
+prefork server does:
+
+- no preload: each worker loads the WSGI application after the fork
+- preload: the parent loads it and runs `warm_up()` before forking
+- preload + prepare_for_fork: as above, plus `gc.freeze()`
+
+Every worker sends an authenticated GET /api/users/me/ through the
+application (the first request is timed), then 500 more, and waits
+while the PSS of the parent and the workers is read from
+/proc/<pid>/smaps_rollup. Linux only; needs the seeded database for the
+user the token is issued to.
+"""
+import argparse
+import io
+import json
+import os
+import re
+import subprocess
+import sys
+import time
+
+from benchmarks import setup
+
+MODES = ['no preload', 'preload', 'preload + prepare_for_fork']
+REQUESTS = 500
+
+
+def memory(pid):
+    fields = {}
+    with open(f'/proc/{pid}/smaps_rollup') as f:
+        for line in f:
+            match = re.match(r'(\w+):\s+(\d+) kB', line)
+            if match:
+                fields[match.group(1)] = int(match.group(2)) / 1024
+    return fields
+
+
+def request(application, token):
+    environ = {
+        'REQUEST_METHOD': 'GET',
+        'PATH_INFO': '/api/users/me/',
+        'QUERY_STRING': '',
+        'SERVER_NAME': 'localhost',
+        'SERVER_PORT': '80',
+        'SERVER_PROTOCOL': 'HTTP/1.1',
+        'HTTP_HOST': 'localhost',
+        'HTTP_AUTHORIZATION': f'Bearer {token}',
+        'wsgi.input': io.BytesIO(),
+        'wsgi.errors': sys.stderr,
+        'wsgi.url_scheme': 'http',
+    }
+    statuses = []
+    response = application(environ, lambda status, headers, exc_info=None: statuses.append(status))
+    b''.join(response)
+    response.close()
+    if not statuses[0].startswith('200'):
+        raise RuntimeError(f'GET /api/users/me/ returned {statuses[0]}')
+
+
+def run_worker(application, token, results, done):
+    if application is None:
+        from django.core.wsgi import get_wsgi_application
+        application = get_wsgi_application()
+    started = time.perf_counter()
+    request(application, token)
+    first_ms = (time.perf_counter() - started) * 1000
+    for _ in range(REQUESTS):
+        request(application, token)
+    os.write(results, (json.dumps({'pid': os.getpid(), 'first_ms': first_ms}) + '\n').encode())
+    # Stay alive until the parent has read our memory
+    os.read(done, 1)
+
+
+def run_mode(mode, workers, token):
+    application = None
+    if mode != 'no preload':
+        from django.core.wsgi import get_wsgi_application
+        from django.db import connections
+
+        from common import prefork
+
+        application = get_wsgi_application()
+        if mode == 'preload':
+            prefork.warm_up(application)
+            connections.close_all()
+        else:
+            prefork.prepare_for_fork(application)
+
+    results_read, results_write = os.pipe()
+    done_read, done_write = os.pipe()
+    pids = []
+    for _ in range(workers):
+        pid = os.fork()
+        if pid == 0:
+            code = 1
+            try:
+                run_worker(application, token, results_write, done_read)
+                code = 0
+            finally:
+                os._exit(code)
+        pids.append(pid)
+
+    with os.fdopen(results_read) as results:
+        reports = [json.loads(results.readline()) for _ in pids]
+        parent = memory(os.getpid())
+        children = [memory(pid) for pid in pids]
+        os.write(done_write, b'x' * workers)
+        for pid in pids:
+            os.waitpid(pid, 0)
+
+    first = [report['first_ms'] for report in reports]
+    private = sum(child['Private_Clean'] + child['Private_Dirty'] for child in children) / workers
+    total_pss = parent['Pss'] + sum(child['Pss'] for child in children)
+    print(f'{mode:>27}: first request {min(first):4.0f}-{max(first):4.0f} ms, per worker RSS '
+          f'{sum(child["Rss"] for child in children) / workers:5.1f} MiB, private {private:5.1f} MiB; '
+          f'total PSS {total_pss:6.1f} MiB')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--mode', choices=MODES, help=argparse.SUPPRESS)
+    parser.add_argument('--token', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.mode:
+        os.environ['DJANGO_SETTINGS_MODULE'] = 'benchmarks.settings'
+        run_mode(args.mode, args.workers, args.token)
+        return
+
+    setup()
+
+    from rest_framework_simplejwt.tokens import AccessToken
+
+    from accounts.models import User
+
+    user, _ = User.objects.get_or_create(
+        email='prefork-bench@example.com', defaults={'first_name': 'Prefork', 'last_name': 'Bench'},
+    )
+    token = str(AccessToken.for_user(user))
+    for mode in MODES:
+        subprocess.run(
+            [sys.executable, '-m', 'benchmarks.prefork', '--mode', mode,
+             '--workers', str(args.workers), '--token', token],
+            check=True,
+        )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,13 @@
+import os
+import tempfile
+
+from doapi.settings import *  # noqa: F401,F403
+
+DATABASES = {
+    'default': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': os.getenv('BENCH_DATABASE', os.path.join(tempfile.gettempdir(), 'doapi-bench.sqlite3')),
+    }
+}
+ALLOWED_HOSTS = ['*']
+DEBUG = False
@@ -0,0 +1,49 @@
+"""
+Validating an HS256 access token with and without the per-process cache.
+
+    python -m benchmarks.token_cache
+
+Times `get_validated_token` of the stock simplejwt authentication against
+CachedJWTAuthentication on a cache hit, which includes the revocation
+list check, and the cache lookup alone.
+"""
+import timeit
+
+from benchmarks import setup
+
+ITERATIONS = 20_000
+
+
+def main():
+    setup()
+
+    from django.core.management import call_command
+    from rest_framework_simplejwt.authentication import JWTAuthentication
+    from rest_framework_simplejwt.settings import api_settings
+    from rest_framework_simplejwt.tokens import AccessToken
+
+    from accounts.authentication import CachedJWTAuthentication
+    from accounts.revocation import revocation_list
+    from common.uuids import generate_uuid
+
+    call_command('migrate', verbosity=0)
+    token = AccessToken()
+    token[api_settings.USER_ID_CLAIM] = str(generate_uuid())
+    raw_token = str(token).encode()
+    revocation_list.load()
+
+    stock = JWTAuthentication()
+    cached = CachedJWTAuthentication()
+    cached.get_validated_token(raw_token)
+    cases = {
+        'uncached': lambda: stock.get_validated_token(raw_token),
+        'cache hit': lambda: cached.get_validated_token(raw_token),
+        'cache lookup only': lambda: cached.cache.get(cached.cache.make_key(raw_token)),
+    }
+    for label, validate in cases.items():
+        seconds = min(timeit.repeat(validate, number=ITERATIONS, repeat=3))
+        print(f'{label:17} {seconds / ITERATIONS * 1e6:5.1f} us per token')
+
+
+if __name__ == '__main__':
+    main()
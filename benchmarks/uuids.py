@@ -0,0 +1,70 @@
+"""
+Insert rate and primary-key index size for UUIDv4 vs UUIDv7 keys.
+
+    python -m benchmarks.uuids [--rows N]
+
+Each version fills its own scratch SQLite file with a table keyed like
+Django's UUIDField on SQLite (char(32) primary key), in 1000-row
+transactions with a 16 MB page cache, then times 100k more rows on the
+full table. Index size comes from the dbstat virtual table. Also times
+generating a key.
+"""
+import argparse
+import os
+import sqlite3
+import tempfile
+import time
+import timeit
+import uuid
+
+from benchmarks import setup
+
+BATCH_SIZE = 1000
+EXTRA_ROWS = 100_000
+
+
+def insert(db, make_key, rows):
+    started = time.perf_counter()
+    for _ in range(rows // BATCH_SIZE):
+        db.execute('BEGIN')
+        db.executemany(
+            'INSERT INTO bench (id, created_at) VALUES (?, ?)',
+            [(make_key().hex, '2025-01-01 00:00:00') for _ in range(BATCH_SIZE)],
+        )
+        db.execute('COMMIT')
+    return rows / (time.perf_counter() - started)
+
+
+def index_size(db):
+    (size,) = db.execute(
+        "SELECT SUM(pgsize) FROM dbstat WHERE name = 'sqlite_autoindex_bench_1'"
+    ).fetchone()
+    return size / 2**20
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--rows', type=int, default=1_000_000)
+    args = parser.parse_args()
+    setup()
+
+    from common.uuids import uuid7
+
+    for label, make_key in (('uuid4', uuid.uuid4), ('uuid7', uuid7)):
+        with tempfile.TemporaryDirectory() as directory:
+            db = sqlite3.connect(os.path.join(directory, 'uuids.sqlite3'), isolation_level=None)
+            db.execute('PRAGMA cache_size = -16000')
+            db.execute('CREATE TABLE bench (id char(32) NOT NULL PRIMARY KEY, created_at datetime NOT NULL)')
+            fill_rate = insert(db, make_key, args.rows)
+            extra_rate = insert(db, make_key, EXTRA_ROWS)
+            print(f'{label}: {fill_rate / 1000:6.1f}k rows/s, next {EXTRA_ROWS // 1000}k '
+                  f'{extra_rate / 1000:6.1f}k rows/s, pk index {index_size(db):.1f} MiB')
+            db.close()
+
+    for label, make_key in (('uuid4', uuid.uuid4), ('uuid7', uuid7)):
+        seconds = min(timeit.repeat(make_key, number=100_000, repeat=3))
+        print(f'{label}: {seconds / 100_000 * 1e6:.1f} us per key')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,210 @@
+import atexit
+import json
+import logging
+import os
+import threading
+import time
+from collections import deque
+from pathlib import Path
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import InterfaceError, OperationalError, close_old_connections, router, transaction
+from django.utils import timezone
+
+from .uuids import generate_uuid
+
+logger = logging.getLogger(__name__)
+
+LOGIN = 'login'
+LOGIN_FAILED = 'login_failed'
+REGISTER = 'register'
+EMAIL_VERIFIED = 'email_verified'
+PASSWORD_CHANGED = 'password_changed'
+PASSWORD_RESET_REQUESTED = 'password_reset_requested'
+PASSWORD_RESET = 'password_reset'
+
+
+class AuditLog:
+    """
+    Buffered writer for `AuditEvent` rows.
+
+    `record()` only appends to a bounded in-memory buffer; a background
+    thread drains it with `bulk_create` in batches and appends each batch to
+    hourly NDJSON files. When the buffer is full, callers wait for the writer
+    (backpressure) for up to `block_timeout` seconds; events that still do
+    not fit are logged and counted in `dropped` rather than queued.
+
+    A batch that fails because the database is unreachable is put back and
+    retried. Any other failure means some row can't be stored; the batch is
+    then written row by row and the rows that still fail are logged and
+    dropped, so they can't hold up the events queued behind them.
+
+    The writer thread runs once `start()` has been called, which the WSGI
+    and ASGI entry points do; what is left is flushed at interpreter exit.
+    Elsewhere (tests, management commands) events stay buffered until
+    `flush()` is called.
+    """
+
+    def __init__(self, capacity=10_000, batch_size=500, flush_interval=1.0,
+                 block_timeout=5.0, export_dir=None):
+        self.capacity = capacity
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.block_timeout = block_timeout
+        self.export_dir = Path(export_dir) if export_dir else None
+        self.dropped = 0
+        self._buffer = deque()
+        self._condition = threading.Condition()
+        self._flush_lock = threading.Lock()
+        self._start_lock = threading.Lock()
+        self._thread = None
+        self._pid = None
+        self._started = False
+        self._closed = False
+
+    def record(self, event, request=None, user=None, email='', **data):
+        """Queue an event; returns False if it had to be dropped."""
+        entry = {
+            'id': generate_uuid(),
+            'event': event,
+            'occurred_at': timezone.now(),
+            'user_id': getattr(user, 'pk', user),
+            'email': (email or getattr(user, 'email', '') or '')[:254],
+            'ip_address': request.META.get('REMOTE_ADDR') if request is not None else None,
+            'user_agent': request.META.get('HTTP_USER_AGENT', '')[:255] if request is not None else '',
+            'data': data,
+        }
+        if self._started:
+            self._ensure_writer()
+
+        with self._condition:
+            deadline = time.monotonic() + self.block_timeout
+            while len(self._buffer) >= self.capacity:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self.dropped += 1
+                    logger.error('Audit buffer full, dropping event: %s', json.dumps(entry, cls=DjangoJSONEncoder))
+                    return False
+                self._condition.notify_all()
+                self._condition.wait(remaining)
+            self._buffer.append(entry)
+            if len(self._buffer) >= self.batch_size:
+                self._condition.notify_all()
+        return True
+
+    def _take_batch(self):
+        with self._condition:
+            batch = [self._buffer.popleft() for _ in range(min(self.batch_size, len(self._buffer)))]
+            self._condition.notify_all()
+        return batch
+
+    def _write(self, batch):
+        from .models import AuditEvent
+
+        # A savepoint when flushed inside a transaction, so a failed batch
+        # doesn't break it for the rows written after it
+        with transaction.atomic(using=router.db_for_write(AuditEvent)):
+            AuditEvent.objects.bulk_create(AuditEvent(**entry) for entry in batch)
+        if self.export_dir is not None:
+            try:
+                self._export(batch)
+            except OSError:
+                logger.exception('Failed to export audit events')
+
+    def _export(self, batch):
+        partitions = {}
+        for entry in batch:
+            name = entry['occurred_at'].strftime('auth-events-%Y%m%dT%H.ndjson')
+            partitions.setdefault(name, []).append(json.dumps(entry, cls=DjangoJSONEncoder))
+        self.export_dir.mkdir(parents=True, exist_ok=True)
+        for name, lines in partitions.items():
+            with open(self.export_dir / name, 'a', encoding='utf-8') as export_file:
+                export_file.write('\n'.join(lines) + '\n')
+
+    def flush(self):
+        """Write everything buffered so far from the calling thread."""
+        with self._flush_lock:
+            while True:
+                batch = self._take_batch()
+                if not batch:
+                    return
+                try:
+                    self._write(batch)
+                except (InterfaceError, OperationalError):
+                    self._requeue(batch)
+                    raise
+                except Exception:
+                    logger.exception('Failed to write audit batch, writing it row by row')
+                    self._write_rows(batch)
+
+    def _write_rows(self, batch):
+        for n, entry in enumerate(batch):
+            try:
+                self._write([entry])
+            except (InterfaceError, OperationalError):
+                self._requeue(batch[n:])
+                raise
+            except Exception:
+                with self._condition:
+                    self.dropped += 1
+                logger.exception('Failed to write audit event, dropping it: %s', json.dumps(entry, cls=DjangoJSONEncoder))
+
+    def _requeue(self, batch):
+        # Put the batch back so it is retried; the buffer may go over
+        # capacity by at most one batch
+        with self._condition:
+            self._buffer.extendleft(reversed(batch))
+
+    def _run(self):
+        while not self._closed:
+            with self._condition:
+                if len(self._buffer) < self.batch_size:
+                    self._condition.wait(self.flush_interval)
+            try:
+                self.flush()
+            except Exception:
+                logger.exception('Failed to write audit events')
+                time.sleep(self.flush_interval)
+            finally:
+                close_old_connections()
+
+    def start(self):
+        """Run the background writer in this process and any forked children."""
+        if not self._started:
+            self._started = True
+            atexit.register(self.close)
+        self._ensure_writer()
+
+    def _ensure_writer(self):
+        if self._pid == os.getpid() and self._thread.is_alive():
+            return
+        with self._start_lock:
+            if self._pid is not None and self._pid != os.getpid():
+                # Forked child: the writer thread did not survive the fork and
+                # the inherited events belong to the parent, which writes them
+                self._buffer = deque()
+                self._condition = threading.Condition()
+                self._flush_lock = threading.Lock()
+            if self._pid != os.getpid() or not self._thread.is_alive():
+                self._pid = os.getpid()
+                self._thread = threading.Thread(target=self._run, name='audit-writer', daemon=True)
+                self._thread.start()
+
+    def close(self):
+        self._closed = True
+        with self._condition:
+            self._condition.notify_all()
+        try:
+            self.flush()
+        except Exception:
+            logger.exception('Failed to write audit events')
+
+
+audit_log = AuditLog(
+    capacity=getattr(settings, 'AUDIT_LOG_CAPACITY', 10_000),
+    batch_size=getattr(settings, 'AUDIT_LOG_BATCH_SIZE', 500),
+    flush_interval=getattr(settings, 'AUDIT_LOG_FLUSH_INTERVAL', 1.0),
+    block_timeout=getattr(settings, 'AUDIT_LOG_BLOCK_TIMEOUT', 5.0),
+    export_dir=getattr(settings, 'AUDIT_LOG_EXPORT_DIR', None),
+)
@@ -0,0 +1,143 @@
+import math
+import unicodedata
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+EARTH_RADIUS_KM = 6371.0088
+GEOHASH_ALPHABET = '0123456789bcdefghjkmnpqrstuvwxyz'
+GEOHASH_PRECISION = 9
+
+
+def geohash_encode(latitude, longitude, precision=GEOHASH_PRECISION):
+    """Encode a coordinate as a geohash string of the given length."""
+    lat_range = [-90.0, 90.0]
+    lon_range = [-180.0, 180.0]
+    chars = []
+    bits = 0
+    value = 0
+    even = True
+    while len(chars) < precision:
+        coord_range, coord = (lon_range, longitude) if even else (lat_range, latitude)
+        mid = (coord_range[0] + coord_range[1]) / 2
+        value <<= 1
+        if coord >= mid:
+            value |= 1
+            coord_range[0] = mid
+        else:
+            coord_range[1] = mid
+        even = not even
+        bits += 1
+        if bits == 5:
+            chars.append(GEOHASH_ALPHABET[value])
+            bits = 0
+            value = 0
+    return ''.join(chars)
+
+
+def geohash_cell_size(precision):
+    """Return the (latitude, longitude) size in degrees of a geohash cell."""
+    lon_bits = math.ceil(precision * 5 / 2)
+    lat_bits = precision * 5 // 2
+    return 180.0 / 2 ** lat_bits, 360.0 / 2 ** lon_bits
+
+
+def geohash_cover(latitude, longitude, radius_km, max_cells=32):
+    """
+    Return geohash prefixes whose cells cover the circle around a point.
+
+    Uses the longest prefix for which the circle's bounding box spans at
+    most `max_cells` cells, and returns every cell the box touches.
+    """
+    lat_delta = radius_km / 110.574
+    lat_min = max(latitude - lat_delta, -90.0)
+    lat_max = min(latitude + lat_delta, 90.0)
+    # Longitude degrees shrink towards the poles; size the box at its widest
+    widest = math.cos(math.radians(max(abs(lat_min), abs(lat_max))))
+    if widest <= 0 or radius_km / (111.320 * widest) >= 180.0:
+        return ['']
+    lon_delta = radius_km / (111.320 * widest)
+
+    for precision in range(GEOHASH_PRECISION, 0, -1):
+        lat_size, lon_size = geohash_cell_size(precision)
+        rows = math.floor(2 * lat_delta / lat_size) + 2
+        columns = math.floor(2 * lon_delta / lon_size) + 2
+        if rows * columns <= max_cells:
+            break
+    else:
+        return ['']
+
+    lat_steps = [min(lat_min + i * lat_size, lat_max) for i in range(rows)]
+    lon_steps = [longitude - lon_delta + i * lon_size for i in range(columns - 1)] + [longitude + lon_delta]
+    cells = set()
+    for lat in lat_steps:
+        for lon in lon_steps:
+            cells.add(geohash_encode(lat, (lon + 180.0) % 360.0 - 180.0, precision))
+    return sorted(cells)
+
+
+def haversine_km(latitude, longitude, points):
+    """
+    Great-circle distance in km from one point to a batch of
+    (latitude, longitude) pairs, with the per-origin terms computed once.
+    """
+    lat1 = math.radians(latitude)
+    lon1 = math.radians(longitude)
+    cos_lat1 = math.cos(lat1)
+    radians, sin, cos, asin, sqrt = math.radians, math.sin, math.cos, math.asin, math.sqrt
+    distances = []
+    for lat2, lon2 in points:
+        lat2 = radians(lat2)
+        a = sin((lat2 - lat1) / 2) ** 2 + cos_lat1 * cos(lat2) * sin((radians(lon2) - lon1) / 2) ** 2
+        distances.append(2 * EARTH_RADIUS_KM * asin(min(sqrt(a), 1.0)))
+    return distances
+
+
+class BaseGeocoder:
+    """Turns a postal address into coordinates, or None when unknown."""
+
+    def geocode(self, address=None, city=None, state=None, country=None, zip_code=None):
+        raise NotImplementedError
+
+
+def _normalize(value):
+    value = unicodedata.normalize('NFKD', value or '').encode('ascii', 'ignore').decode()
+    return ' '.join(value.lower().split())
+
+
+class OfflineGeocoder(BaseGeocoder):
+    """
+    Geocoder that resolves city centres from a built-in table, for
+    development, tests and as a fallback when no geocoding service is set.
+    """
+
+    CITIES = {
+        ('lima', 'peru'): (-12.0464, -77.0428),
+        ('callao', 'peru'): (-12.0566, -77.1181),
+        ('arequipa', 'peru'): (-16.4090, -71.5375),
+        ('cusco', 'peru'): (-13.5320, -71.9675),
+        ('trujillo', 'peru'): (-8.1091, -79.0215),
+        ('chiclayo', 'peru'): (-6.7714, -79.8409),
+        ('piura', 'peru'): (-5.1945, -80.6328),
+        ('iquitos', 'peru'): (-3.7437, -73.2516),
+        ('huancayo', 'peru'): (-12.0651, -75.2049),
+        ('puno', 'peru'): (-15.8402, -70.0219),
+        ('bogota', 'colombia'): (4.7110, -74.0721),
+        ('medellin', 'colombia'): (6.2442, -75.5812),
+        ('quito', 'ecuador'): (-0.1807, -78.4678),
+        ('santiago', 'chile'): (-33.4489, -70.6693),
+        ('buenos aires', 'argentina'): (-34.6037, -58.3816),
+        ('mexico city', 'mexico'): (19.4326, -99.1332),
+    }
+
+    def geocode(self, address=None, city=None, state=None, country=None, zip_code=None):
+        city = _normalize(city)
+        country = _normalize(country)
+        if (city, country) in self.CITIES:
+            return self.CITIES[(city, country)]
+        matches = [coords for (name, _), coords in self.CITIES.items() if name == city]
+        return matches[0] if len(matches) == 1 else None
+
+
+def get_geocoder():
+    return import_string(getattr(settings, 'GEOCODER', 'common.geo.OfflineGeocoder'))()
@@ -0,0 +1,119 @@
+"""
+`Idempotency-Key` support for POST endpoints.
+
+The first response to a request carrying an `Idempotency-Key` header is
+stored in the cache (status, content type and body bytes) for
+IDEMPOTENCY_KEY_TTL seconds. Retries with the same key get the stored
+response without running the view again; duplicates arriving while the
+first request is still running wait for it on a lock held in the cache.
+
+Keys are scoped to the endpoint and the authenticated user, and a key
+reused with a different request body is rejected. Errors raised as
+exceptions (validation, authentication) and 5xx responses are not stored,
+so those requests can be retried with the same key.
+
+Duplicates are only detected across processes when the cache alias in
+IDEMPOTENCY_CACHE is shared between them (Redis, Memcached, database).
+"""
+import functools
+import hashlib
+import json
+import time
+import uuid
+
+from django.conf import settings
+from django.core.cache import caches
+from django.http import HttpResponse
+from django.utils.crypto import salted_hmac
+from rest_framework import status
+from rest_framework.exceptions import ValidationError
+from rest_framework.response import Response
+
+HEADER = 'Idempotency-Key'
+MAX_KEY_LENGTH = 255
+POLL_INTERVAL = 0.05
+
+
+def get_cache():
+    return caches[getattr(settings, 'IDEMPOTENCY_CACHE', 'default')]
+
+
+def make_cache_key(request, key):
+    user_id = request.user.pk if request.user.is_authenticated else ''
+    scope = f'{request.path}\0{user_id}\0{key}'
+    return 'idempotency:' + hashlib.sha256(scope.encode()).hexdigest()
+
+
+def fingerprint(request):
+    # Keyed with SECRET_KEY: bodies carry passwords, and a plain hash stored
+    # in a shared cache could be brute-forced offline
+    body = json.dumps(request.data, sort_keys=True, default=str)
+    return salted_hmac('common.idempotency', f'{request.method}\0{body}', algorithm='sha256').hexdigest()
+
+
+def replay(record, request_fingerprint):
+    if record['fingerprint'] != request_fingerprint:
+        return Response(
+            {'detail': f'{HEADER} was already used with a different request.'},
+            status=status.HTTP_422_UNPROCESSABLE_ENTITY,
+        )
+    response = HttpResponse(record['content'], status=record['status'], content_type=record['content_type'])
+    response['Idempotent-Replayed'] = 'true'
+    return response
+
+
+def idempotent(handler):
+    """Decorate a view handler so retries with the same key are replayed."""
+
+    @functools.wraps(handler)
+    def wrapper(self, request, *args, **kwargs):
+        key = request.headers.get(HEADER)
+        if not key:
+            return handler(self, request, *args, **kwargs)
+        if len(key) > MAX_KEY_LENGTH:
+            raise ValidationError({HEADER: [f'Ensure this header has no more than {MAX_KEY_LENGTH} characters.']})
+
+        cache = get_cache()
+        cache_key = make_cache_key(request, key)
+        lock_key = f'{cache_key}:lock'
+        request_fingerprint = fingerprint(request)
+        lock_token = uuid.uuid4().hex
+        deadline = time.monotonic() + getattr(settings, 'IDEMPOTENCY_WAIT_TIMEOUT', 10)
+
+        while True:
+            record = cache.get(cache_key)
+            if record is not None:
+                return replay(record, request_fingerprint)
+            if cache.add(lock_key, lock_token, getattr(settings, 'IDEMPOTENCY_LOCK_TIMEOUT', 60)):
+                break
+            if time.monotonic() >= deadline:
+                return Response(
+                    {'detail': f'A request with this {HEADER} is still being processed.'},
+                    status=status.HTTP_409_CONFLICT,
+                )
+            time.sleep(POLL_INTERVAL)
+
+        try:
+            # The previous holder may have stored its response between our
+            # cache lookup and taking the lock
+            record = cache.get(cache_key)
+            if record is not None:
+                return replay(record, request_fingerprint)
+
+            response = handler(self, request, *args, **kwargs)
+            if isinstance(response, Response):
+                response = self.finalize_response(request, response, *args, **kwargs)
+                response.render()
+            if response.status_code < 500 and not response.streaming:
+                cache.set(cache_key, {
+                    'fingerprint': request_fingerprint,
+                    'status': response.status_code,
+                    'content_type': response.get('Content-Type'),
+                    'content': response.content,
+                }, getattr(settings, 'IDEMPOTENCY_KEY_TTL', 24 * 60 * 60))
+            return response
+        finally:
+            if cache.get(lock_key) == lock_token:
+                cache.delete(lock_key)
+
+    return wrapper
@@ -0,0 +1,76 @@
+import functools
+import re
+from urllib.parse import urlsplit
+
+from corsheaders import middleware as cors_middleware
+from corsheaders.conf import conf as cors_conf
+from django.conf import settings
+from django.contrib.auth import middleware as auth_middleware
+from django.contrib.messages import middleware as messages_middleware
+from django.contrib.sessions import middleware as sessions_middleware
+from django.middleware import csrf
+
+
+class CorsMiddleware(cors_middleware.CorsMiddleware):
+    """
+    `corsheaders` middleware with the allowed origins parsed and their
+    regexes compiled once at startup, and origin checks memoized.
+
+    Install it first so preflight requests are answered before any other
+    middleware runs.
+    """
+
+    def __init__(self, get_response):
+        super().__init__(get_response)
+        self.allowed_origins = frozenset(
+            (url.scheme, url.netloc) for url in map(urlsplit, cors_conf.CORS_ALLOWED_ORIGINS)
+        )
+        self.origin_regexes = [re.compile(pattern) for pattern in cors_conf.CORS_ALLOWED_ORIGIN_REGEXES]
+        self.origin_found_in_white_lists = functools.lru_cache(maxsize=1024)(self.origin_found_in_white_lists)
+
+    def regex_domain_match(self, origin):
+        return any(pattern.match(origin) for pattern in self.origin_regexes)
+
+    def _url_in_whitelist(self, url):
+        return (url.scheme, url.netloc) in self.allowed_origins
+
+
+class StatelessPathMixin:
+    """
+    Skip a middleware for requests under STATELESS_PATH_PREFIXES.
+
+    The API is authenticated with JWTs only, so its requests need no
+    session, messages, `request.user` from the session, or CSRF check (DRF
+    views are CSRF exempt unless they use session authentication).
+    """
+
+    def __init__(self, get_response):
+        super().__init__(get_response)
+        self.prefixes = tuple(getattr(settings, 'STATELESS_PATH_PREFIXES', ('/api/',)))
+
+    def is_stateless(self, request):
+        return request.path_info.startswith(self.prefixes)
+
+    def __call__(self, request):
+        if self.is_stateless(request):
+            return self.get_response(request)
+        return super().__call__(request)
+
+
+class SessionMiddleware(StatelessPathMixin, sessions_middleware.SessionMiddleware):
+    pass
+
+
+class CsrfViewMiddleware(StatelessPathMixin, csrf.CsrfViewMiddleware):
+    def process_view(self, request, callback, callback_args, callback_kwargs):
+        if self.is_stateless(request):
+            return None
+        return super().process_view(request, callback, callback_args, callback_kwargs)
+
+
+class AuthenticationMiddleware(StatelessPathMixin, auth_middleware.AuthenticationMiddleware):
+    pass
+
+
+class MessageMiddleware(StatelessPathMixin, messages_middleware.MessageMiddleware):
+    pass
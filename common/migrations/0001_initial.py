@@ -0,0 +1,33 @@
+# Generated by Django 5.2.1 on 2026-10-19 01:23
+
+import uuid
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AuditEvent',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('event', models.CharField(max_length=50)),
+                ('occurred_at', models.DateTimeField(db_index=True)),
+                ('user_id', models.UUIDField(blank=True, db_index=True, null=True)),
+                ('email', models.CharField(blank=True, max_length=254)),
+                ('ip_address', models.GenericIPAddressField(blank=True, null=True)),
+                ('user_agent', models.CharField(blank=True, max_length=255)),
+                ('data', models.JSONField(blank=True, default=dict)),
+            ],
+            options={
+                'abstract': False,
+            },
+        ),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 5.2.1 on 2026-10-19 01:32
+
+import common.uuids
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('common', '0001_initial'),
+    ]
+
+    # Only the Python-side default changes, so nothing is run against the
+    # database (SQLite would otherwise rebuild the tables). Existing UUIDv4
+    # keys stay valid; new rows get the version UUID_PRIMARY_KEY_VERSION picks.
+    operations = [
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.AlterField(
+                    model_name='auditevent',
+                    name='id',
+                    field=models.UUIDField(default=common.uuids.generate_uuid, editable=False, primary_key=True, serialize=False),
+                ),
+            ],
+        ),
+    ]
@@ -1,15 +1,34 @@
 from django.db import models
-import uuid
+
+from .uuids import generate_uuid
 
 
 class TimeStampedModel(models.Model):
     """
     An abstract base class model that provides self-updating
     `created_at` and `updated_at` fields.
+
+    Primary keys are random UUIDv4s, or time-ordered UUIDv7s when
+    UUID_PRIMARY_KEY_VERSION is 7. Both kinds fit the same column, so
+    switching only changes the keys of new rows.
     """
-    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    id = models.UUIDField(primary_key=True, default=generate_uuid, editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
         abstract = True
+
+
+class AuditEvent(TimeStampedModel):
+    """Append-only record of an authentication event."""
+    event = models.CharField(max_length=50)
+    occurred_at = models.DateTimeField(db_index=True)
+    user_id = models.UUIDField(blank=True, null=True, db_index=True)
+    email = models.CharField(max_length=254, blank=True)
+    ip_address = models.GenericIPAddressField(blank=True, null=True)
+    user_agent = models.CharField(max_length=255, blank=True)
+    data = models.JSONField(default=dict, blank=True)
+
+    def __str__(self):
+        return f"{self.event} {self.email} at {self.occurred_at}"
@@ -0,0 +1,97 @@
+"""
+Warm-up for prefork servers.
+
+Call `prepare_for_fork()` in the parent process once the WSGI application
+is loaded and before workers are forked, e.g. from a gunicorn `when_ready`
+hook with `preload_app = True` (see the README). It does the work each
+worker would otherwise repeat on its first requests, then moves every
+object to the permanent GC generation with `gc.freeze()` so garbage
+collections in the workers don't write to, and so copy, the shared pages.
+"""
+import gc
+import io
+import logging
+import sys
+from pathlib import Path
+
+from django.conf import settings
+from django.db import connections
+from django.template.loader import get_template
+from django.urls import URLResolver, get_resolver
+from django.utils import translation
+
+logger = logging.getLogger(__name__)
+
+
+def iter_callbacks(resolver):
+    for pattern in resolver.url_patterns:
+        if isinstance(pattern, URLResolver):
+            yield from iter_callbacks(pattern)
+        else:
+            yield pattern.callback
+
+
+def warm_serializers(resolver):
+    """Build the fields of every DRF view's serializer, filling model metadata caches."""
+    seen = set()
+    for callback in iter_callbacks(resolver):
+        view_class = getattr(callback, 'cls', None)
+        serializer_class = getattr(view_class, 'serializer_class', None)
+        if serializer_class is None or serializer_class in seen:
+            continue
+        seen.add(serializer_class)
+        try:
+            serializer_class().fields
+        except Exception:
+            logger.warning('Could not warm up %s', serializer_class.__name__, exc_info=True)
+
+
+def warm_templates():
+    """Compile the project's own templates (emails) into the cached loader."""
+    base_dir = Path(settings.BASE_DIR)
+    for templates_dir in base_dir.glob('*/templates'):
+        for path in templates_dir.rglob('*.html'):
+            get_template(path.relative_to(templates_dir).as_posix())
+
+
+def warm_request(application):
+    """Send one request that needs no database through the full stack."""
+    hosts = [host for host in settings.ALLOWED_HOSTS if host != '*' and not host.startswith('.')]
+    host = hosts[0] if hosts else 'localhost'
+    environ = {
+        'REQUEST_METHOD': 'GET',
+        'PATH_INFO': '/.well-known/jwks.json',
+        'QUERY_STRING': '',
+        'SERVER_NAME': host,
+        'SERVER_PORT': '80',
+        'SERVER_PROTOCOL': 'HTTP/1.1',
+        'HTTP_HOST': host,
+        'wsgi.input': io.BytesIO(),
+        'wsgi.errors': sys.stderr,
+        'wsgi.url_scheme': 'http',
+    }
+    response = application(environ, lambda status, headers, exc_info=None: None)
+    try:
+        for _ in response:
+            pass
+    finally:
+        response.close()
+
+
+def warm_up(application):
+    resolver = get_resolver()
+    resolver.reverse_dict
+    warm_serializers(resolver)
+    warm_templates()
+    with translation.override(settings.LANGUAGE_CODE):
+        translation.gettext('This field is required.')
+    warm_request(application)
+
+
+def prepare_for_fork(application):
+    """Warm the application up and freeze the heap; call in the parent only."""
+    warm_up(application)
+    # Workers must not share the parent's database connections
+    connections.close_all()
+    gc.collect()
+    gc.freeze()
@@ -0,0 +1,232 @@
+"""
+On-demand profiling of live workers.
+
+With PROFILING_ENABLED, `ProfilingMiddleware` profiles a PROFILING_SAMPLE_RATE
+fraction of requests plus any request carrying a signed `X-Profile` header
+(issued to staff by `/api/profiling/token/`). Each profile is written to
+PROFILING_DIR, as collapsed stacks (`.collapsed`, one `frame;frame;... count`
+line per stack, the input of flamegraph.pl, speedscope or inferno) from a
+stack sampler, or as a `.prof` pstats dump with PROFILING_MODE = 'cprofile'.
+Its file name is returned in the `X-Profile-Id` response header. Only the
+newest PROFILING_MAX_FILES profiles, and as many snapshots, are kept.
+
+`take_snapshot()` and `compare_snapshots()` save `tracemalloc` snapshots of
+the current worker and diff two of them to find memory growth.
+
+When PROFILING_ENABLED is off the middleware removes itself from the chain,
+so requests don't pay for it at all.
+"""
+import cProfile
+import os
+import random
+import re
+import sys
+import threading
+import time
+import tracemalloc
+import uuid
+from collections import Counter
+from pathlib import Path
+
+from django.conf import settings
+from django.core import signing
+from django.core.exceptions import MiddlewareNotUsed
+
+PROFILE_HEADER = 'X-Profile'
+PROFILE_ID_HEADER = 'X-Profile-Id'
+TOKEN_SALT = 'common.profiling'
+FILE_NAME_RE = re.compile(r'^[\w.-]+\.(collapsed|prof|tracemalloc)$')
+PROFILE_SUFFIXES = ('.collapsed', '.prof')
+SNAPSHOT_SUFFIXES = ('.tracemalloc',)
+
+
+def profiling_dir():
+    path = Path(settings.PROFILING_DIR)
+    path.mkdir(parents=True, exist_ok=True)
+    return path
+
+
+def new_file_name(label, suffix):
+    label = re.sub(r'\W+', '_', label).strip('_')[:60]
+    return f"{time.strftime('%Y%m%dT%H%M%S')}-{os.getpid()}-{label}-{uuid.uuid4().hex[:6]}.{suffix}"
+
+
+def resolve_file(name):
+    """Path of a file in PROFILING_DIR, or None if the name is not one of ours."""
+    if not FILE_NAME_RE.match(name):
+        return None
+    path = profiling_dir() / name
+    return path if path.is_file() else None
+
+
+def iter_files(suffixes=PROFILE_SUFFIXES + SNAPSHOT_SUFFIXES):
+    for entry in os.scandir(profiling_dir()):
+        if FILE_NAME_RE.match(entry.name) and entry.name.endswith(suffixes):
+            try:
+                stat = entry.stat()
+            except FileNotFoundError:
+                # Pruned by another worker
+                continue
+            yield entry, stat
+
+
+def list_files():
+    files = [
+        {'name': entry.name, 'size': stat.st_size, 'modified': stat.st_mtime}
+        for entry, stat in iter_files()
+    ]
+    return sorted(files, key=lambda item: item['modified'], reverse=True)
+
+
+def prune_files(suffixes):
+    """Delete all but the newest PROFILING_MAX_FILES files with these suffixes."""
+    files = sorted(iter_files(suffixes), key=lambda item: item[1].st_mtime, reverse=True)
+    for entry, _ in files[settings.PROFILING_MAX_FILES:]:
+        Path(entry.path).unlink(missing_ok=True)
+
+
+def make_token(user):
+    return signing.TimestampSigner(salt=TOKEN_SALT).sign(str(user.pk))
+
+
+def check_token(token):
+    try:
+        signing.TimestampSigner(salt=TOKEN_SALT).unsign(token, max_age=settings.PROFILING_TOKEN_MAX_AGE)
+    except signing.BadSignature:
+        return False
+    return True
+
+
+def frame_label(code):
+    name = getattr(code, 'co_qualname', code.co_name)
+    return f'{name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})'
+
+
+class StackSampler:
+    """
+    Records the stack of one thread every `interval` seconds from a
+    background thread. Frames at and above `root` (the caller's own frame)
+    are left out, so stacks start at the profiled code.
+    """
+
+    def __init__(self, thread_id, interval, root=None):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.root = root
+        self.stacks = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='stack-sampler', daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+        self.root = None
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is not None:
+                self.sample(frame)
+
+    def sample(self, frame):
+        labels = []
+        while frame is not None and frame is not self.root:
+            labels.append(frame_label(frame.f_code))
+            frame = frame.f_back
+        if labels:
+            self.stacks[';'.join(reversed(labels))] += 1
+
+    def write(self, path):
+        with open(path, 'w') as f:
+            for stack, count in self.stacks.most_common():
+                f.write(f'{stack} {count}\n')
+
+
+class ProfilingMiddleware:
+    """Profile sampled or opted-in requests; see the module docstring."""
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'PROFILING_ENABLED', False):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.sample_rate = settings.PROFILING_SAMPLE_RATE
+        self.mode = settings.PROFILING_MODE
+        self.interval = settings.PROFILING_SAMPLE_INTERVAL
+
+    def __call__(self, request):
+        if self.should_profile(request):
+            return self.profile(request)
+        return self.get_response(request)
+
+    def should_profile(self, request):
+        token = request.META.get('HTTP_X_PROFILE')
+        if token:
+            return check_token(token)
+        return self.sample_rate > 0 and random.random() < self.sample_rate
+
+    def profile(self, request):
+        label = f'{request.method}-{request.path_info}'
+        if self.mode == 'cprofile':
+            name = new_file_name(label, 'prof')
+            profiler = cProfile.Profile()
+            try:
+                response = profiler.runcall(self.get_response, request)
+            finally:
+                profiler.dump_stats(profiling_dir() / name)
+                prune_files(PROFILE_SUFFIXES)
+        else:
+            name = new_file_name(label, 'collapsed')
+            sampler = StackSampler(threading.get_ident(), self.interval, root=sys._getframe())
+            sampler.start()
+            try:
+                response = self.get_response(request)
+            finally:
+                sampler.stop()
+                sampler.write(profiling_dir() / name)
+                prune_files(PROFILE_SUFFIXES)
+        response[PROFILE_ID_HEADER] = name
+        return response
+
+
+def start_tracing():
+    if not tracemalloc.is_tracing():
+        tracemalloc.start(settings.PROFILING_TRACEMALLOC_FRAMES)
+
+
+def stop_tracing():
+    tracemalloc.stop()
+
+
+def take_snapshot():
+    """Save a tracemalloc snapshot of this worker, starting tracing if needed."""
+    start_tracing()
+    snapshot = tracemalloc.take_snapshot().filter_traces((
+        tracemalloc.Filter(False, tracemalloc.__file__),
+        tracemalloc.Filter(False, '<frozen importlib._bootstrap>'),
+        tracemalloc.Filter(False, '<frozen importlib._bootstrap_external>'),
+    ))
+    name = new_file_name('memory', 'tracemalloc')
+    snapshot.dump(str(profiling_dir() / name))
+    prune_files(SNAPSHOT_SUFFIXES)
+    current, peak = tracemalloc.get_traced_memory()
+    return {'name': name, 'pid': os.getpid(), 'traced_memory': current, 'traced_memory_peak': peak}
+
+
+def compare_snapshots(old_path, new_path, key_type='lineno', limit=25):
+    """The allocation sites that grew most between two saved snapshots."""
+    old = tracemalloc.Snapshot.load(str(old_path))
+    new = tracemalloc.Snapshot.load(str(new_path))
+    stats = new.compare_to(old, key_type)
+    return [
+        {
+            'location': str(stat.traceback),
+            'size_diff': stat.size_diff,
+            'size': stat.size,
+            'count_diff': stat.count_diff,
+            'count': stat.count,
+        }
+        for stat in stats[:limit]
+    ]
@@ -1,3 +1,296 @@
-from django.test import TestCase
+import json
+import math
+import pstats
+import random
+import tempfile
+import threading
+import time
+import tracemalloc
+import uuid
+from pathlib import Path
+from unittest import mock
 
-# Create your tests here.
+from django.core.wsgi import get_wsgi_application
+from django.db import OperationalError, connection
+from django.test import Client, SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APITestCase
+
+from accounts.models import User
+
+from . import audit
+from .audit import AuditLog
+from .geo import OfflineGeocoder, geohash_cover, geohash_encode, haversine_km
+from .models import AuditEvent
+from .prefork import prepare_for_fork
+from .profiling import ProfilingMiddleware
+from .uuids import generate_uuid, uuid7
+
+
+class GeoTests(SimpleTestCase):
+    def test_geohash_encode(self):
+        self.assertEqual(geohash_encode(57.64911, 10.40744, 11), 'u4pruydqqvj')
+        self.assertEqual(geohash_encode(-12.0464, -77.0428, 5), '6mc5q')
+
+    def test_haversine(self):
+        lima, cusco = (-12.0464, -77.0428), (-13.5320, -71.9675)
+        self.assertAlmostEqual(haversine_km(*lima, [cusco])[0], 574.6, places=1)
+        self.assertEqual(haversine_km(*lima, [lima]), [0.0])
+
+    def test_cover_contains_every_point_in_radius(self):
+        rng = random.Random(7)
+        for _ in range(300):
+            lat, lon = rng.uniform(-80, 80), rng.uniform(-180, 180)
+            radius = rng.choice([0.5, 5, 25, 100, 400])
+            cells = geohash_cover(lat, lon, radius)
+            for _ in range(20):
+                # Random point inside the circle
+                bearing = rng.uniform(0, 2 * math.pi)
+                distance = radius * math.sqrt(rng.random()) * 0.999
+                dlat = distance / 110.574 * math.cos(bearing)
+                dlon = distance / (111.320 * math.cos(math.radians(lat + dlat))) * math.sin(bearing)
+                point = (lat + dlat, (lon + dlon + 180) % 360 - 180)
+                if haversine_km(lat, lon, [point])[0] > radius:
+                    continue
+                code = geohash_encode(*point)
+                self.assertTrue(any(code.startswith(cell) for cell in cells), (lat, lon, radius, point))
+
+    def test_offline_geocoder(self):
+        geocoder = OfflineGeocoder()
+        self.assertEqual(geocoder.geocode(city='Lima', country='Perú'), (-12.0464, -77.0428))
+        self.assertEqual(geocoder.geocode(city=' cusco '), (-13.5320, -71.9675))
+        self.assertIsNone(geocoder.geocode(city='Atlantis'))
+
+
+class AuditLogTests(TestCase):
+    def test_flush_writes_batches_and_exports_ndjson(self):
+        with tempfile.TemporaryDirectory() as export_dir:
+            log = AuditLog(batch_size=2, export_dir=export_dir)
+            for n in range(5):
+                log.record(audit.LOGIN_FAILED, email=f'user{n}@example.com', attempt=n)
+            with CaptureQueriesContext(connection) as queries:
+                log.flush()
+            self.assertEqual(sum(query['sql'].startswith('INSERT') for query in queries), 3)
+
+            self.assertEqual(AuditEvent.objects.filter(event=audit.LOGIN_FAILED).count(), 5)
+            [export_file] = Path(export_dir).iterdir()
+            self.assertRegex(export_file.name, r'^auth-events-\d{8}T\d{2}\.ndjson$')
+            lines = [json.loads(line) for line in export_file.read_text().splitlines()]
+            self.assertEqual([line['data']['attempt'] for line in lines], [0, 1, 2, 3, 4])
+
+    def test_failed_write_is_retried(self):
+        log = AuditLog()
+        log.record(audit.REGISTER, email='a@example.com')
+        with mock.patch.object(AuditEvent.objects, 'bulk_create', side_effect=OperationalError):
+            with self.assertRaises(OperationalError):
+                log.flush()
+        log.flush()
+        self.assertTrue(AuditEvent.objects.filter(email='a@example.com').exists())
+
+    def test_row_that_cannot_be_written_is_dropped(self):
+        log = AuditLog(batch_size=3)
+        log.record(audit.LOGIN, email='before@example.com')
+        log.record(audit.LOGIN, user='not-a-uuid', email='bad@example.com')
+        for n in range(4):
+            log.record(audit.LOGIN_FAILED, email=f'after{n}@example.com')
+        with self.assertLogs('common.audit', 'ERROR'):
+            log.flush()
+        log.record(audit.LOGIN_FAILED, email='x' * 300)
+        log.flush()
+
+        self.assertEqual(log.dropped, 1)
+        self.assertFalse(log._buffer)
+        self.assertEqual(
+            set(AuditEvent.objects.values_list('email', flat=True)),
+            {'before@example.com', 'after0@example.com', 'after1@example.com', 'after2@example.com',
+             'after3@example.com', 'x' * 254},
+        )
+
+    def test_full_buffer_drops_after_timeout(self):
+        log = AuditLog(capacity=2, block_timeout=0.05)
+        self.assertTrue(log.record(audit.LOGIN))
+        self.assertTrue(log.record(audit.LOGIN))
+        with self.assertLogs('common.audit', 'ERROR'):
+            self.assertFalse(log.record(audit.LOGIN))
+        self.assertEqual(log.dropped, 1)
+
+
+class AuditLogBackpressureTests(SimpleTestCase):
+    def test_producers_wait_for_slow_writer(self):
+        log = AuditLog(capacity=10, batch_size=5, flush_interval=0.01, block_timeout=5)
+        written = []
+        peak = []
+
+        def slow_write(batch):
+            peak.append(len(log._buffer))
+            time.sleep(0.005)
+            written.extend(batch)
+
+        log._write = slow_write
+        log.start()
+        threads = [
+            threading.Thread(target=lambda: [log.record(audit.LOGIN) for _ in range(50)]) for _ in range(4)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        log.close()
+
+        self.assertEqual(len(written), 200)
+        self.assertEqual(log.dropped, 0)
+        self.assertLessEqual(max(peak), 10)
+
+
+class UUIDTests(TestCase):
+    def test_uuid7_layout_and_order(self):
+        before = time.time_ns() // 1_000_000
+        keys = [uuid7() for _ in range(10_000)]
+        after = time.time_ns() // 1_000_000
+
+        self.assertEqual({key.version for key in keys}, {7})
+        self.assertEqual({key.variant for key in keys}, {uuid.RFC_4122})
+        self.assertEqual(keys, sorted(keys))
+        self.assertEqual(len(set(keys)), len(keys))
+        self.assertTrue(before <= keys[0].int >> 80 <= keys[-1].int >> 80 <= after + 1)
+
+    def test_primary_key_version_setting(self):
+        self.assertEqual(generate_uuid().version, 4)
+        old = AuditEvent.objects.create(event=audit.LOGIN, occurred_at=timezone.now())
+        with override_settings(UUID_PRIMARY_KEY_VERSION=7):
+            new = AuditEvent.objects.create(event=audit.LOGIN, occurred_at=timezone.now())
+        self.assertEqual((old.pk.version, new.pk.version), (4, 7))
+        self.assertEqual(set(AuditEvent.objects.values_list('pk', flat=True)), {old.pk, new.pk})
+
+
+class MiddlewareTests(TestCase):
+    def preflight(self, path='/api/login/', origin='http://localhost:3000'):
+        return self.client.options(path, HTTP_ORIGIN=origin, HTTP_ACCESS_CONTROL_REQUEST_METHOD='POST')
+
+    def test_api_requests_skip_session_middleware(self):
+        response = self.client.get('/api/users/me/')
+        self.assertEqual(response.status_code, 401)
+        self.assertFalse(hasattr(response.wsgi_request, 'session'))
+        self.assertNotIn('Set-Cookie', response)
+
+        response = self.client.get('/admin/login/')
+        self.assertTrue(hasattr(response.wsgi_request, 'session'))
+        self.assertEqual(Client(enforce_csrf_checks=True).post('/admin/login/').status_code, 403)
+
+    def test_preflight_is_answered_early(self):
+        with self.assertNumQueries(0):
+            response = self.preflight()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Access-Control-Allow-Origin'], 'http://localhost:3000')
+        self.assertEqual(response['Access-Control-Max-Age'], '86400')
+        self.assertIn('idempotency-key', response['Access-Control-Allow-Headers'])
+
+    def test_origin_matching(self):
+        self.assertNotIn('Access-Control-Allow-Origin', self.preflight(origin='https://localhost:3000'))
+        self.assertNotIn('Access-Control-Allow-Origin', self.preflight(origin='http://evil.example'))
+        self.assertNotIn('Access-Control-Allow-Origin', self.preflight(path='/admin/login/'))
+        regexes = [r'^https://\w+\.digitalorder\.lat$', r'(?i)^https://partner\.example$']
+        with override_settings(CORS_ALLOWED_ORIGIN_REGEXES=regexes):
+            self.client = Client()
+            allowed = self.preflight(origin='https://app.digitalorder.lat')
+            rejected = self.preflight(origin='https://app.digitalorder.lat.evil.example')
+            partner = self.preflight(origin='https://PARTNER.example')
+        self.assertEqual(allowed['Access-Control-Allow-Origin'], 'https://app.digitalorder.lat')
+        self.assertNotIn('Access-Control-Allow-Origin', rejected)
+        self.assertEqual(partner['Access-Control-Allow-Origin'], 'https://PARTNER.example')
+
+
+class PreforkTests(SimpleTestCase):
+    def test_warm_up_needs_no_database_and_freezes_heap(self):
+        application = get_wsgi_application()
+        with mock.patch('common.prefork.gc.freeze') as freeze, self.assertNoLogs('common.prefork'):
+            prepare_for_fork(application)
+        freeze.assert_called_once_with()
+
+
+class ProfilingTests(APITestCase):
+    def setUp(self):
+        self.profile_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.profile_dir.cleanup)
+        self.addCleanup(tracemalloc.stop)
+        self.staff = User.objects.create_user(email='staff@example.com', password='S3cure-pass!', is_staff=True)
+
+    def enabled(self, **options):
+        return override_settings(PROFILING_ENABLED=True, PROFILING_DIR=self.profile_dir.name, **options)
+
+    def test_disabled_profiling_is_not_installed(self):
+        with mock.patch.object(ProfilingMiddleware, 'should_profile') as should_profile:
+            self.client.get('/api/users/me/', HTTP_X_PROFILE='token')
+        should_profile.assert_not_called()
+        self.client.force_authenticate(self.staff)
+        self.assertEqual(self.client.post('/api/profiling/token/').status_code, 404)
+
+    def test_signed_header_profiles_login(self):
+        with self.enabled(PROFILING_SAMPLE_INTERVAL=0.0005):
+            self.client.force_authenticate(self.staff)
+            token = self.client.post('/api/profiling/token/').data['token']
+            self.client.force_authenticate(None)
+
+            self.assertNotIn('X-Profile-Id', self.client.post('/api/login/', {'email': 'x@example.com', 'password': 'x'}))
+            self.assertNotIn('X-Profile-Id', self.client.post('/api/login/', {}, HTTP_X_PROFILE=token + 'x'))
+            response = self.client.post(
+                '/api/login/', {'email': 'staff@example.com', 'password': 'wrong'}, HTTP_X_PROFILE=token,
+            )
+
+        self.assertEqual(response.status_code, 401)
+        lines = (Path(self.profile_dir.name) / response['X-Profile-Id']).read_text().splitlines()
+        self.assertTrue(lines)
+        for line in lines:
+            self.assertRegex(line, r'^\S.* \d+$')
+        self.assertTrue(any('CustomTokenObtainPairView.post' in line for line in lines))
+        self.assertFalse(any('ProfilingMiddleware' in line for line in lines))
+
+    def test_sampled_requests_use_cprofile(self):
+        self.client.force_authenticate(self.staff)
+        with self.enabled(PROFILING_SAMPLE_RATE=1.0, PROFILING_MODE='cprofile'):
+            response = self.client.get('/api/users/')
+            files = self.client.get('/api/profiling/').data['results']
+            download = self.client.get(f"/api/profiling/files/{response['X-Profile-Id']}/")
+            self.assertEqual(self.client.get('/api/profiling/files/..%2Fsecret.prof/').status_code, 404)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(download.status_code, 200)
+        self.assertIn(response['X-Profile-Id'], [item['name'] for item in files])
+        stats = pstats.Stats(str(Path(self.profile_dir.name) / response['X-Profile-Id']))
+        self.assertIn('list', {function for _, _, function in stats.stats})
+
+    def test_old_profiles_are_pruned(self):
+        self.client.force_authenticate(self.staff)
+        with self.enabled(PROFILING_SAMPLE_RATE=1.0, PROFILING_MODE='cprofile', PROFILING_MAX_FILES=3):
+            names = [self.client.get('/api/users/me/')['X-Profile-Id'] for _ in range(5)]
+            kept = sorted(path.name for path in Path(self.profile_dir.name).iterdir())
+            listing = self.client.get('/api/profiling/').data
+
+        self.assertEqual(kept, sorted(names[-3:]))
+        self.assertEqual(sorted(item['name'] for item in listing['results']), kept)
+
+    def test_memory_snapshot_diff(self):
+        self.client.force_authenticate(self.staff)
+        with self.enabled():
+            first = self.client.post('/api/profiling/memory/snapshots/').data
+            retained = [bytearray(1024) for _ in range(1000)]
+            second = self.client.post('/api/profiling/memory/snapshots/').data
+            diff = self.client.get('/api/profiling/memory/diff/', {'from': first['name'], 'to': second['name']})
+            bad = self.client.get('/api/profiling/memory/diff/', {'from': first['name'], 'to': 'missing.tracemalloc'})
+            stopped = self.client.delete('/api/profiling/memory/snapshots/')
+
+        self.assertEqual(diff.status_code, 200)
+        self.assertEqual(bad.status_code, 400)
+        self.assertEqual(stopped.status_code, 204)
+        self.assertFalse(tracemalloc.is_tracing())
+        top = diff.data[0]
+        self.assertIn('common/tests.py', top['location'])
+        self.assertGreaterEqual(top['size_diff'], 1024 * len(retained))
+
+    def test_endpoints_are_staff_only(self):
+        user = User.objects.create_user(email='user@example.com', password='S3cure-pass!')
+        self.client.force_authenticate(user)
+        with self.enabled():
+            self.assertEqual(self.client.post('/api/profiling/token/').status_code, 403)
+            self.assertEqual(self.client.post('/api/profiling/memory/snapshots/').status_code, 403)
@@ -0,0 +1,17 @@
+from django.urls import path
+
+from .views import (
+    MemoryDiffView,
+    MemorySnapshotView,
+    ProfileFileListView,
+    ProfileFileView,
+    ProfileTokenView,
+)
+
+urlpatterns = [
+    path('', ProfileFileListView.as_view(), name='profiling-files'),
+    path('token/', ProfileTokenView.as_view(), name='profiling-token'),
+    path('files/<str:name>/', ProfileFileView.as_view(), name='profiling-file'),
+    path('memory/snapshots/', MemorySnapshotView.as_view(), name='memory-snapshots'),
+    path('memory/diff/', MemoryDiffView.as_view(), name='memory-diff'),
+]
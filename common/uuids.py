@@ -0,0 +1,48 @@
+import os
+import threading
+import time
+import uuid
+
+from django.conf import settings
+
+_lock = threading.Lock()
+_last_ms = 0
+_counter = 0
+
+
+def uuid7():
+    """
+    Return a time-ordered UUID (version 7, RFC 9562).
+
+    The first 48 bits are the Unix time in milliseconds, so keys generated
+    later sort after earlier ones and inserts land at the end of indexes.
+    The 12 `rand_a` bits are a counter that starts at a random value each
+    millisecond, which keeps keys from one process strictly increasing; the
+    remaining 62 bits are random.
+    """
+    global _last_ms, _counter
+    with _lock:
+        now_ms = time.time_ns() // 1_000_000
+        if now_ms > _last_ms:
+            _last_ms = now_ms
+            _counter = int.from_bytes(os.urandom(2), 'big') & 0x7FF
+        else:
+            _counter += 1
+            if _counter > 0xFFF:
+                # Counter exhausted (or the clock went back): borrow the next millisecond
+                _last_ms += 1
+                _counter = 0
+        unix_ms, counter = _last_ms, _counter
+    rand_b = int.from_bytes(os.urandom(8), 'big') & 0x3FFFFFFFFFFFFFFF
+    value = unix_ms << 80 | 0x7 << 76 | counter << 64 | 0b10 << 62 | rand_b
+    return uuid.UUID(int=value)
+
+
+def generate_uuid():
+    """
+    Default primary key for `TimeStampedModel`: a UUIDv7 when
+    UUID_PRIMARY_KEY_VERSION is 7, otherwise a random UUIDv4.
+    """
+    if getattr(settings, 'UUID_PRIMARY_KEY_VERSION', 4) == 7:
+        return uuid7()
+    return uuid.uuid4()
@@ -1,3 +1,84 @@
-from django.shortcuts import render
+from django.conf import settings
+from django.http import FileResponse, Http404
+from rest_framework import permissions, status
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.views import APIView
 
-# Create your views here.
+from . import profiling
+
+
+class ProfilingView(APIView):
+    """Base for the staff-only profiling endpoints, which only exist with PROFILING_ENABLED."""
+    permission_classes = [permissions.IsAdminUser]
+
+    def initial(self, request, *args, **kwargs):
+        if not getattr(settings, 'PROFILING_ENABLED', False):
+            raise Http404
+        super().initial(request, *args, **kwargs)
+
+
+class ProfileTokenView(ProfilingView):
+    """Issue a signed header value that gets the requests carrying it profiled."""
+
+    def post(self, request):
+        return Response({
+            'header': profiling.PROFILE_HEADER,
+            'token': profiling.make_token(request.user),
+            'expires_in': settings.PROFILING_TOKEN_MAX_AGE,
+        })
+
+
+class ProfileFileListView(ProfilingView):
+    """Profiles and memory snapshots written by this host's workers, newest first."""
+    pagination_class = api_settings.DEFAULT_PAGINATION_CLASS
+
+    def get(self, request):
+        paginator = self.pagination_class()
+        page = paginator.paginate_queryset(profiling.list_files(), request, view=self)
+        return paginator.get_paginated_response(page)
+
+
+class ProfileFileView(ProfilingView):
+    """Download one profile or snapshot."""
+
+    def get(self, request, name):
+        path = profiling.resolve_file(name)
+        if path is None:
+            raise Http404
+        return FileResponse(open(path, 'rb'), as_attachment=True, filename=name)
+
+
+class MemorySnapshotView(ProfilingView):
+    """
+    POST saves a tracemalloc snapshot of the worker serving the request
+    (tracing starts with the first one); DELETE stops tracing.
+    """
+
+    def post(self, request):
+        return Response(profiling.take_snapshot(), status=status.HTTP_201_CREATED)
+
+    def delete(self, request):
+        profiling.stop_tracing()
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+
+class MemoryDiffView(ProfilingView):
+    """Allocation sites that grew most between the snapshots `from` and `to`."""
+
+    def get(self, request):
+        old_path = profiling.resolve_file(request.query_params.get('from', ''))
+        new_path = profiling.resolve_file(request.query_params.get('to', ''))
+        if old_path is None or new_path is None or old_path.suffix != '.tracemalloc' or new_path.suffix != '.tracemalloc':
+            return Response({'detail': '`from` and `to` must name memory snapshots.'}, status=status.HTTP_400_BAD_REQUEST)
+        # Snapshot names carry the worker's pid; other workers have other heaps
+        if old_path.name.split('-')[1] != new_path.name.split('-')[1]:
+            return Response({'detail': 'Snapshots were taken in different workers.'}, status=status.HTTP_400_BAD_REQUEST)
+        key_type = request.query_params.get('group_by', 'lineno')
+        if key_type not in ('lineno', 'filename', 'traceback'):
+            return Response({'detail': '`group_by` must be lineno, filename or traceback.'}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            limit = min(int(request.query_params.get('limit', 25)), 500)
+        except ValueError:
+            limit = 25
+        return Response(profiling.compare_snapshots(old_path, new_path, key_type=key_type, limit=limit))
@@ -14,3 +14,7 @@ from django.core.asgi import get_asgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'doapi.settings')
 
 application = get_asgi_application()
+
+from common.audit import audit_log  # noqa: E402
+
+audit_log.start()
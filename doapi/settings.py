@@ -10,9 +10,11 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 import os
+import tempfile
 from pathlib import Path
 from datetime import timedelta
 from dotenv import load_dotenv
+from corsheaders.defaults import default_headers
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -53,16 +55,22 @@ INSTALLED_APPS = [
     'common',
 ]
 
+# Session, CSRF, auth and messages middleware are skipped for the
+# JWT-authenticated paths in STATELESS_PATH_PREFIXES
 MIDDLEWARE = [
+    'common.middleware.CorsMiddleware',
+    'common.profiling.ProfilingMiddleware',
     'django.middleware.security.SecurityMiddleware',
-    'django.contrib.sessions.middleware.SessionMiddleware',
+    'common.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
-    'django.middleware.csrf.CsrfViewMiddleware',
-    'django.contrib.auth.middleware.AuthenticationMiddleware',
-    'django.contrib.messages.middleware.MessageMiddleware',
+    'common.middleware.CsrfViewMiddleware',
+    'common.middleware.AuthenticationMiddleware',
+    'common.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
+STATELESS_PATH_PREFIXES = ['/api/', '/.well-known/']
+
 ROOT_URLCONF = 'doapi.urls'
 
 TEMPLATES = [
@@ -99,13 +107,13 @@ DATABASES = {
 
 AUTH_PASSWORD_VALIDATORS = [
     {
-        'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator',
+        'NAME': 'accounts.password_validation.UserAttributeSimilarityValidator',
     },
     {
         'NAME': 'django.contrib.auth.password_validation.MinimumLengthValidator',
     },
     {
-        'NAME': 'django.contrib.auth.password_validation.CommonPasswordValidator',
+        'NAME': 'accounts.password_validation.CommonPasswordValidator',
     },
     {
         'NAME': 'django.contrib.auth.password_validation.NumericPasswordValidator',
@@ -118,7 +126,7 @@ AUTH_USER_MODEL = 'accounts.User'
 # REST Framework settings
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'accounts.authentication.CachedJWTAuthentication',
     ),
     'DEFAULT_PERMISSION_CLASSES': (
         'rest_framework.permissions.IsAuthenticated',
@@ -157,7 +165,7 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 SIMPLE_JWT = {
     'ACCESS_TOKEN_LIFETIME': timedelta(minutes=60),
     'REFRESH_TOKEN_LIFETIME': timedelta(days=1),
-    'ROTATE_REFRESH_TOKENS': False,
+    'ROTATE_REFRESH_TOKENS': True,
     'BLACKLIST_AFTER_ROTATION': True,
     'UPDATE_LAST_LOGIN': False,
     'ALGORITHM': 'HS256',
@@ -175,11 +183,50 @@ SIMPLE_JWT = {
     'SLIDING_TOKEN_REFRESH_EXP_CLAIM': 'refresh_exp',
     'SLIDING_TOKEN_LIFETIME': timedelta(minutes=5),
     'SLIDING_TOKEN_REFRESH_LIFETIME': timedelta(days=1),
+    'TOKEN_REFRESH_SERIALIZER': 'accounts.serializers.CustomTokenRefreshSerializer',
 }
 
+# Revoked tokens are mirrored in a per-process Bloom filter, refreshed from
+# the database every TOKEN_REVOCATION_SYNC_INTERVAL seconds
+TOKEN_REVOCATION_CAPACITY = int(os.getenv('TOKEN_REVOCATION_CAPACITY', 100000))
+TOKEN_REVOCATION_SYNC_INTERVAL = float(os.getenv('TOKEN_REVOCATION_SYNC_INTERVAL', 5))
+
+# Asymmetric JWT signing keys as comma-separated `kid=/path/to/key.pem` pairs.
+# The first private key signs new tokens; the others (private or public PEM)
+# only verify, so keys can be rotated. All of them are published at
+# /.well-known/jwks.json. Leave unset to keep HS256 with SECRET_KEY.
+JWT_SIGNING_KEYS = [
+    {'kid': kid, 'path': path}
+    for kid, _, path in (item.partition('=') for item in os.getenv('JWT_SIGNING_KEY_FILES', '').split(',') if item)
+]
+JWKS_MAX_AGE = int(os.getenv('JWKS_MAX_AGE', 3600))
+
+# Per-process LRU of validated access tokens (0 disables it)
+JWT_VERIFICATION_CACHE_SIZE = int(os.getenv('JWT_VERIFICATION_CACHE_SIZE', 1024))
+
 # CORS settings
 CORS_ALLOW_ALL_ORIGINS = DEBUG
 CORS_ALLOWED_ORIGINS = os.getenv('CORS_ALLOWED_ORIGINS', 'http://localhost:3000').split(',')
+CORS_ALLOW_HEADERS = (*default_headers, 'idempotency-key')
+CORS_URLS_REGEX = r'^/(api|\.well-known)/'
+# Browsers cap this (Chromium at 2 hours), but it lets them skip preflights
+CORS_PREFLIGHT_MAX_AGE = int(os.getenv('CORS_PREFLIGHT_MAX_AGE', 86400))
+
+# Cache; point it at a shared backend (Redis, Memcached, database) when
+# running several processes so idempotency keys are seen by all of them
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv('CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.getenv('CACHE_LOCATION', ''),
+    }
+}
+
+# Responses to requests sent with an Idempotency-Key header are replayed
+# for retries within IDEMPOTENCY_KEY_TTL seconds
+IDEMPOTENCY_CACHE = 'default'
+IDEMPOTENCY_KEY_TTL = int(os.getenv('IDEMPOTENCY_KEY_TTL', 24 * 60 * 60))
+IDEMPOTENCY_LOCK_TIMEOUT = int(os.getenv('IDEMPOTENCY_LOCK_TIMEOUT', 60))
+IDEMPOTENCY_WAIT_TIMEOUT = float(os.getenv('IDEMPOTENCY_WAIT_TIMEOUT', 10))
 
 # Cloudinary settings
 CLOUDINARY_STORAGE = {
@@ -189,6 +236,35 @@ CLOUDINARY_STORAGE = {
 }
 DEFAULT_FILE_STORAGE = 'cloudinary_storage.storage.MediaCloudinaryStorage'
 
+# Authentication audit log: events are buffered in memory (up to
+# AUDIT_LOG_CAPACITY) and written in batches by a background thread.
+# Set AUDIT_LOG_EXPORT_DIR to also append them to hourly NDJSON files.
+AUDIT_LOG_CAPACITY = int(os.getenv('AUDIT_LOG_CAPACITY', 10000))
+AUDIT_LOG_BATCH_SIZE = int(os.getenv('AUDIT_LOG_BATCH_SIZE', 500))
+AUDIT_LOG_FLUSH_INTERVAL = float(os.getenv('AUDIT_LOG_FLUSH_INTERVAL', 1.0))
+AUDIT_LOG_BLOCK_TIMEOUT = float(os.getenv('AUDIT_LOG_BLOCK_TIMEOUT', 5.0))
+AUDIT_LOG_EXPORT_DIR = os.getenv('AUDIT_LOG_EXPORT_DIR')
+
+# Primary keys for new rows: 4 (random) or 7 (time-ordered, better insert
+# locality; exposes the creation time in the key)
+UUID_PRIMARY_KEY_VERSION = int(os.getenv('UUID_PRIMARY_KEY_VERSION', 4))
+
+# Request profiling and memory snapshots (see common/profiling.py). When
+# enabled, PROFILING_SAMPLE_RATE of requests and those with a signed
+# X-Profile header from /api/profiling/token/ are profiled into PROFILING_DIR,
+# which keeps the newest PROFILING_MAX_FILES profiles and as many snapshots
+PROFILING_ENABLED = os.getenv('PROFILING_ENABLED', 'False') == 'True'
+PROFILING_SAMPLE_RATE = float(os.getenv('PROFILING_SAMPLE_RATE', 0))
+PROFILING_MODE = os.getenv('PROFILING_MODE', 'sample')  # 'sample' or 'cprofile'
+PROFILING_SAMPLE_INTERVAL = float(os.getenv('PROFILING_SAMPLE_INTERVAL', 0.002))
+PROFILING_DIR = os.getenv('PROFILING_DIR', os.path.join(tempfile.gettempdir(), 'doapi-profiles'))
+PROFILING_MAX_FILES = int(os.getenv('PROFILING_MAX_FILES', 100))
+PROFILING_TOKEN_MAX_AGE = int(os.getenv('PROFILING_TOKEN_MAX_AGE', 15 * 60))
+PROFILING_TRACEMALLOC_FRAMES = int(os.getenv('PROFILING_TRACEMALLOC_FRAMES', 10))
+
+# Geocoder used to fill Profile coordinates from the address
+GEOCODER = os.getenv('GEOCODER', 'common.geo.OfflineGeocoder')
+
 # Resend API settings
 RESEND_API_KEY = os.getenv('RESEND_API_KEY')
 DEFAULT_FROM_EMAIL = "DigitalOrder <team@digitalorder.lat>"
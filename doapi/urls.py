@@ -16,14 +16,17 @@ Including another URLconf
 """
 from django.contrib import admin
 from django.urls import path, include
-from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView
+from rest_framework_simplejwt.views import TokenRefreshView
+from accounts.views import CustomTokenObtainPairView, JWKSView
 
 urlpatterns = [
     path('admin/', admin.site.urls),
     # JWT authentication
-    path('api/token/', TokenObtainPairView.as_view(), name='token_obtain_pair'),
+    path('api/token/', CustomTokenObtainPairView.as_view(), name='token_obtain_pair'),
     path('api/token/refresh/', TokenRefreshView.as_view(), name='token_refresh'),
+    path('.well-known/jwks.json', JWKSView.as_view(), name='jwks'),
     
     # API endpoints
+    path('api/profiling/', include('common.urls')),
     path('api/', include('accounts.urls')),
 ]
@@ -14,3 +14,7 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'doapi.settings')
 
 application = get_wsgi_application()
+
+from common.audit import audit_log  # noqa: E402
+
+audit_log.start()